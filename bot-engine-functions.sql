@@ -0,0 +1,59 @@
+-- Database functions (and supporting indexes) used by the Python bot engine (python/bot_engine.py)
+-- Run this in the Supabase SQL editor after the base schema.
+
+-- Open a position and record its entry trade in one round trip / one transaction,
+-- so a crash can never leave a position without its trade (or vice versa).
+-- p_position / p_trade are row-shaped JSON objects; the position id is returned, typed
+-- like bot_positions.id (TEXT or uuid) rather than assuming one.
+-- p_monitoring_log_id (a JSON string, or null) is the pair's "Monitoring ..." bot_logs
+-- row, deleted in the same round trip now that the pair has a position.
+DROP FUNCTION IF EXISTS public.open_position_atomic(jsonb, jsonb);
+DROP FUNCTION IF EXISTS public.open_position_atomic(jsonb, jsonb, jsonb);
+CREATE OR REPLACE FUNCTION public.open_position_atomic(p_position jsonb, p_trade jsonb,
+                                                       p_monitoring_log_id jsonb DEFAULT NULL)
+RETURNS public.bot_positions.id%TYPE AS $$
+DECLARE
+    v_position_id public.bot_positions.id%TYPE;
+BEGIN
+    INSERT INTO public.bot_positions (id, bot_id, symbol, side, size, entry_price, current_price,
+                                      stop_loss, take_profit, opened_at, status)
+    SELECT id, bot_id, symbol, side, size, entry_price, current_price,
+           stop_loss, take_profit, opened_at, status
+    FROM jsonb_populate_record(NULL::public.bot_positions, p_position)
+    RETURNING id INTO v_position_id;
+
+    INSERT INTO public.bot_trades (id, bot_id, position_id, symbol, side, size, price, executed_at, mode)
+    SELECT id, bot_id, v_position_id, symbol, side, size, price, executed_at, mode
+    FROM jsonb_populate_record(NULL::public.bot_trades, p_trade);
+
+    -- Compared as text: bot_logs.id is TEXT (gen_random_uuid()::text) in the base schema
+    DELETE FROM public.bot_logs WHERE id::text = p_monitoring_log_id #>> '{}';
+
+    RETURN v_position_id;
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION public.open_position_atomic(jsonb, jsonb, jsonb) TO service_role;
+
+-- Mark-to-market every open position touched this tick in one statement.
+-- p_rows: [{"id": string, "current_price": number, "unrealized_pnl": number}, ...]
+-- Positions closed in the meantime are left alone (status guard). Ids are compared as
+-- text so this works whether bot_positions.id is TEXT (like the other tables) or uuid.
+CREATE OR REPLACE FUNCTION public.bulk_update_positions(p_rows jsonb)
+RETURNS void AS $$
+    UPDATE public.bot_positions p
+    SET current_price = x.current_price,
+        unrealized_pnl = x.unrealized_pnl
+    FROM jsonb_to_recordset(p_rows) AS x(id text, current_price numeric, unrealized_pnl numeric)
+    WHERE p.id::text = x.id
+      AND p.status = 'open';
+$$ LANGUAGE sql;
+
+GRANT EXECUTE ON FUNCTION public.bulk_update_positions(jsonb) TO service_role;
+
+-- The engine reloads every running bot's open positions in one query
+-- (bot_id IN (...) AND status = 'open'); this keeps it an index scan over open rows only
+-- instead of reading every closed position the bots ever had.
+CREATE INDEX IF NOT EXISTS bot_positions_open_by_bot_idx
+    ON public.bot_positions (bot_id)
+    WHERE status = 'open';
@@ -5,19 +5,60 @@ Runs 24/7 on Render, connects to Hyperliquid WebSocket, writes to Supabase
 
 import asyncio
 import os
+import sys
+import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Optional
 import json
-import requests
+import numpy as np
+import aiohttp
+import httpx
 from loguru import logger
 from supabase import create_client, Client
 from hyperliquid.info import Info
 from dotenv import load_dotenv
 
+try:
+    from numba import njit
+except ImportError:  # Numba is optional - kernels run as plain Python without it
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda fn: fn
+
+try:
+    import orjson
+except ImportError:  # orjson is optional - log batches and RPCs go through supabase-py's own encoder without it
+    orjson = None
+
+try:
+    import asyncpg
+except ImportError:  # asyncpg is optional - hot writes go through PostgREST without it
+    asyncpg = None
+
+try:
+    import uvloop
+except ImportError:  # uvloop is optional - the engine runs on the stock asyncio loop without it
+    uvloop = None
+
+try:
+    import h2  # noqa: F401 - only needed by httpx for HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:  # h2 is optional - PostgREST calls use pooled HTTP/1.1 keep-alive without it
+    HTTP2_AVAILABLE = False
+
 # Load environment variables
 load_dotenv()
 
+# Per-pair debug lines are only built when BOT_DEBUG=1 - their f-strings would otherwise
+# be formatted every tick just for loguru to drop them
+DEBUG_ENABLED = os.getenv('BOT_DEBUG', '0') == '1'
+logger.remove()
+logger.add(sys.stderr, level='DEBUG' if DEBUG_ENABLED else 'INFO')
+
 # Initialize Supabase
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
@@ -28,126 +69,1022 @@ if not SUPABASE_URL or not SUPABASE_KEY:
 logger.info(f"🔗 Connecting to Supabase: {SUPABASE_URL[:30]}...")
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-# Initialize Hyperliquid (use mainnet by default, skip websocket for now)
-info = Info(skip_ws=True)
+# Optional direct Postgres connection for the hot write paths (logs, position marks,
+# entries, last_tick_at). Use the direct or session-mode pooler URL - not the
+# transaction-mode pooler, which doesn't support prepared statements.
+DATABASE_URL = os.getenv('DATABASE_URL')
+pg_pool = None  # asyncpg.Pool, created by init_pg_pool() inside the event loop
+
+# Initialize Hyperliquid (mainnet by default, websocket enabled for pushed market data)
+info = Info(skip_ws=False)
 
 # Hyperliquid API base URL
 HYPERLIQUID_API_URL = "https://api.hyperliquid.xyz/info"
 
-def fetch_l2_orderbook(coin: str) -> Optional[dict]:
-    """Fetch L2 orderbook directly from Hyperliquid API (Python SDK doesn't have l2_book method)"""
+# One keep-alive session for every Hyperliquid REST call (created lazily inside the event loop)
+hl_session: Optional[aiohttp.ClientSession] = None
+
+
+async def hl_info(payload: dict, timeout: float = 10):
+    """POST to the Hyperliquid info endpoint over the shared pooled session
+    
+    Unlike the SDK's blocking requests calls this doesn't stall the event loop, and
+    concurrent bots/pairs reuse warm TCP/TLS connections instead of handshaking per call.
+    """
+    global hl_session
+    if hl_session is None or hl_session.closed:
+        hl_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(
+            limit=32,  # Concurrent connections to the one Hyperliquid host
+            keepalive_timeout=60,  # Longer than the 1s tick, so connections stay warm between ticks
+            ttl_dns_cache=300  # Don't re-resolve api.hyperliquid.xyz on every new connection
+        ))
+    async with hl_session.post(HYPERLIQUID_API_URL, json=payload, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+        response.raise_for_status()
+        if orjson is not None:
+            return orjson.loads(await response.read())  # L2 books and candle snapshots parse several times faster
+        return await response.json()
+
+
+class MarketDataStream:
+    """Keeps the latest mids and L2 books pushed over the Hyperliquid websocket
+    
+    Callbacks run on the SDK's websocket thread. They only ever swap whole objects
+    into place, so readers on the event loop never see a half-updated book.
+    
+    When the feed is stale, fetch_mids/fetch_book fall back to REST through a short
+    shared cache, and concurrent callers of the same key share one in-flight request,
+    so N bots cost one Hyperliquid call instead of N.
+    
+    allMids pushes several times a second, so when it goes silent for reconnect_after
+    seconds the websocket is assumed dead: ensure_connected opens a new one and
+    re-subscribes every feed, backing off exponentially while attempts keep failing.
+    """
+    
+    def __init__(self, info: Info, max_age: float = 5, rest_ttl: float = 0.5, reconnect_after: float = 30):
+        self.info = info
+        self.max_age = max_age  # Seconds before pushed data counts as stale (REST fallback)
+        self.rest_ttl = rest_ttl  # Seconds a REST fallback snapshot is shared across bots
+        self.trades_ttl = 2.0  # Seconds a recent-trades snapshot is shared (bots poll it every 5s, out of phase)
+        self.mids: Dict[str, str] = {}
+        self.mids_updated_at: float = 0  # Monotonic, like every received_at below (immune to wall-clock jumps)
+        self.books: Dict[str, tuple] = {}  # coin -> (received_at monotonic, {coin, levels, time})
+        self.book_coins: set = set()
+        self.candles: Dict[tuple, tuple] = {}  # (coin, interval) -> (received_at monotonic, {t: candle} for the last 2 candles)
+        self.candle_keys: set = set()
+        self.rest_cache: Dict[str, tuple] = {}  # 'mids' / 'book:<coin>' -> (fetched_at, data)
+        self.inflight: Dict[str, asyncio.Future] = {}  # Same keys -> pending REST request
+        self.reconnect_after = reconnect_after
+        self.reconnect_delay = reconnect_after  # Doubles per attempt while the feed stays silent (max 5 min)
+        self.next_reconnect_at: float = 0
+        self.connected_at = time.monotonic()
+        self.info.subscribe({'type': 'allMids'}, self._on_mids)
+    
+    def _on_mids(self, msg: dict):
+        mids = msg.get('data', {}).get('mids')
+        if mids:
+            self.mids = mids
+            self.mids_updated_at = time.monotonic()
+    
+    def _on_book(self, msg: dict):
+        data = msg.get('data')
+        if data and 'coin' in data:
+            self.books[data['coin']] = (time.monotonic(), data)
+    
+    def _on_candle(self, msg: dict):
+        data = msg.get('data')
+        if data and 's' in data and 'i' in data:
+            key = (data['s'], data['i'])
+            entry = self.candles.get(key)
+            pushed = dict(entry[1]) if entry else {}
+            pushed[data['t']] = data
+            # Keep the current candle plus the previous one (its final update may not have been merged yet)
+            for t in sorted(pushed)[:-2]:
+                del pushed[t]
+            self.candles[key] = (time.monotonic(), pushed)
+    
+    def subscribe_book(self, coin: str):
+        """Subscribe to l2Book pushes for a coin (no-op if already subscribed)"""
+        if coin in self.book_coins:
+            return
+        self.book_coins.add(coin)
+        try:
+            self.info.subscribe({'type': 'l2Book', 'coin': coin}, self._on_book)
+            logger.info(f"📡 Subscribed to {coin} L2 book")
+        except Exception as e:
+            self.book_coins.discard(coin)
+            logger.warning(f"⚠️ Failed to subscribe to {coin} L2 book: {e}")
+    
+    def subscribe_candles(self, coin: str, interval: str):
+        """Subscribe to candle pushes for a coin/interval (no-op if already subscribed)"""
+        key = (coin, interval)
+        if key in self.candle_keys:
+            return
+        self.candle_keys.add(key)
+        try:
+            self.info.subscribe({'type': 'candle', 'coin': coin, 'interval': interval}, self._on_candle)
+            logger.info(f"📡 Subscribed to {coin} {interval} candles")
+        except Exception as e:
+            self.candle_keys.discard(key)
+            logger.warning(f"⚠️ Failed to subscribe to {coin} {interval} candles: {e}")
+    
+    async def ensure_connected(self):
+        """Reconnect the websocket and re-subscribe every feed if allMids has gone silent"""
+        now = time.monotonic()
+        silent_for = now - max(self.mids_updated_at, self.connected_at)
+        if silent_for < self.reconnect_after:
+            self.reconnect_delay = self.reconnect_after
+            return
+        if now < self.next_reconnect_at:
+            return
+        self.next_reconnect_at = now + self.reconnect_delay
+        self.reconnect_delay = min(self.reconnect_delay * 2, 300)
+        
+        logger.warning(f"📡 No websocket data for {silent_for:.0f}s - reconnecting")
+        try:
+            # Info() fetches exchange metadata over blocking HTTP - keep it off the event loop
+            new_info = await asyncio.get_running_loop().run_in_executor(None, lambda: Info(skip_ws=False))
+        except Exception as e:
+            logger.error(f"❌ Websocket reconnect failed: {e}")
+            return
+        try:
+            self.info.disconnect_websocket()
+        except Exception:
+            pass  # Already dead
+        self.info = new_info
+        self.connected_at = time.monotonic()
+        self.info.subscribe({'type': 'allMids'}, self._on_mids)
+        books, candles = list(self.book_coins), list(self.candle_keys)
+        self.book_coins.clear()
+        self.candle_keys.clear()
+        for coin in books:
+            self.subscribe_book(coin)
+        for coin, interval in candles:
+            self.subscribe_candles(coin, interval)
+        logger.info(f"📡 Websocket reconnected ({len(books)} book(s), {len(candles)} candle feed(s))")
+    
+    def get_candles(self, coin: str, interval: str) -> Optional[tuple]:
+        """(received_at monotonic, {t: candle}) of the latest pushed candles, or None"""
+        return self.candles.get((coin, interval))
+    
+    def get_mids(self) -> Optional[Dict[str, str]]:
+        """Latest pushed mids, or None if the feed is stale"""
+        if self.mids and time.monotonic() - self.mids_updated_at <= self.max_age:
+            return self.mids
+        return None
+    
+    def get_book(self, coin: str) -> Optional[dict]:
+        """Latest pushed L2 book for a coin, or None if missing/stale"""
+        entry = self.books.get(coin)
+        if entry and time.monotonic() - entry[0] <= self.max_age:
+            return entry[1]
+        return None
+    
+    async def _rest(self, key: str, payload: dict, ttl: float):
+        """Shared, coalesced REST snapshot (raises on failure)"""
+        entry = self.rest_cache.get(key)
+        if entry and time.monotonic() - entry[0] <= ttl:
+            return entry[1]
+        
+        task = self.inflight.get(key)
+        if task is None:
+            async def fetch():
+                async with info_rate_limiter:
+                    data = await hl_info(payload, timeout=5)
+                self.rest_cache[key] = (time.monotonic(), data)
+                return data
+            task = asyncio.ensure_future(fetch())
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        return await asyncio.shield(task)
+    
+    async def fetch_mids(self) -> Optional[Dict[str, str]]:
+        """Pushed mids, else one shared REST snapshot (stale snapshot on error, None if none)"""
+        mids = self.get_mids()
+        if mids is not None:
+            return mids
+        try:
+            return await self._rest('mids', {'type': 'allMids'}, self.rest_ttl)
+        except Exception as e:
+            logger.error(f"Failed to fetch Hyperliquid prices: {e}")
+            entry = self.rest_cache.get('mids')
+            return entry[1] if entry else None
+    
+    async def fetch_trades(self, coin: str) -> list:
+        """Recent trades for a coin - one shared REST snapshot per trades_ttl (raises on failure)"""
+        return await self._rest(f'trades:{coin}', {'type': 'recentTrades', 'coin': coin}, self.trades_ttl)
+    
+    async def fetch_book(self, coin: str) -> Optional[dict]:
+        """Pushed L2 book, else one shared REST snapshot (subscribes so later ticks are pushed)"""
+        book = self.get_book(coin)
+        if book is not None:
+            return book
+        
+        # Not streaming yet (or feed stale) - subscribe so next tick is served from the websocket
+        self.subscribe_book(coin)
+        
+        data = await self._rest(f'book:{coin}', {'type': 'l2Book', 'coin': coin}, self.rest_ttl)
+        if isinstance(data, list):
+            data = data[0] if data else None
+        return data or None  # { coin, levels: [bids, asks], time }
+
+
+market_stream = MarketDataStream(info)
+
+
+class AsyncTokenBucket:
+    """Async token bucket: up to `capacity` calls in a burst, refilled at `rate` calls/second"""
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+    
+    def refill(self):
+        """Credit the tokens accrued since the last update"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    async def acquire(self):
+        """Wait until a token is available, then take it"""
+        async with self.lock:
+            while True:
+                self.refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+    
+    def try_acquire(self) -> bool:
+        """Take a token if one is available right now (never waits)"""
+        self.refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+    
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+# Shared across all bots: Hyperliquid allows 1200 request weight per minute per IP and
+# candleSnapshot costs ~20, so sustained candle fetches must stay under ~1/s
+candle_rate_limiter = AsyncTokenBucket(rate=0.75, capacity=5)
+
+# Shared by the light info calls (mids/book REST fallbacks, recent trades, ~2 weight each) so a
+# stale websocket feed across many coins can't burn the per-IP budget the candle fetches rely on
+info_rate_limiter = AsyncTokenBucket(rate=5, capacity=20)
+
+
+# Threads for the blocking supabase-py calls. Sized well below Supabase's connection limits:
+# bots tick concurrently, and this is what bounds how many PostgREST requests are in flight
+DB_WORKERS = 8
+db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix='supabase')
+
+# supabase-py's PostgREST default is 120s - a stalled request would hold up the engine tick
+# (and a db_executor thread) that long. Reads and writes here are small and fast when healthy.
+POSTGREST_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
+
+def pool_postgrest_session():
+    """Swap supabase-py's PostgREST httpx session for one sized to db_executor
+    
+    Keeps one warm keep-alive connection per executor thread (multiplexed over HTTP/2
+    when h2 is installed) and retries a failed connect once, e.g. after the server
+    closed an idle connection. Base URL and auth headers carry over; requests are
+    bounded by POSTGREST_TIMEOUT.
+    """
     try:
-        response = requests.post(
-            HYPERLIQUID_API_URL,
-            headers={'Content-Type': 'application/json'},
-            json={'type': 'l2Book', 'coin': coin},
-            timeout=5
+        old = supabase.postgrest.session
+        limits = httpx.Limits(max_connections=DB_WORKERS, max_keepalive_connections=DB_WORKERS, keepalive_expiry=60)
+        supabase.postgrest.session = httpx.Client(
+            base_url=old.base_url,
+            headers=old.headers,
+            timeout=POSTGREST_TIMEOUT,
+            transport=httpx.HTTPTransport(http2=HTTP2_AVAILABLE, limits=limits, retries=1)
         )
+        old.close()
+        logger.info(f"🔌 PostgREST session pooled ({DB_WORKERS} connections, HTTP/{'2' if HTTP2_AVAILABLE else '1.1'})")
+    except Exception as e:
+        logger.warning(f"⚠️ Keeping supabase-py's default PostgREST session: {e}")
+
+
+pool_postgrest_session()
+
+
+async def db_execute(query):
+    """Execute a supabase-py query in db_executor so the blocking HTTP call doesn't
+    stall the event loop (and every other bot's tick) while it's in flight"""
+    return await asyncio.get_running_loop().run_in_executor(db_executor, query.execute)
+
+
+async def init_pg_pool():
+    """Create the asyncpg pool if DATABASE_URL is set (falls back to PostgREST on failure)"""
+    global pg_pool
+    if not DATABASE_URL:
+        return
+    if asyncpg is None:
+        logger.warning("⚠️ DATABASE_URL is set but asyncpg isn't installed - using PostgREST for writes")
+        return
+    try:
+        pg_pool = await asyncpg.create_pool(DATABASE_URL, min_size=2, max_size=20, max_inactive_connection_lifetime=300)
+        logger.info("🐘 Connected asyncpg pool for hot-path writes")
+    except Exception as e:
+        logger.error(f"Failed to create asyncpg pool, using PostgREST for writes: {e}")
+
+
+async def close_connections():
+    """Close the shared Hyperliquid session and the asyncpg pool (engine shutdown)"""
+    global hl_session, pg_pool
+    if hl_session is not None and not hl_session.closed:
+        await hl_session.close()
+    hl_session = None
+    if pg_pool is not None:
+        await pg_pool.close()
+        pg_pool = None
+
+
+def json_dumps(value) -> str:
+    """JSON-encode a payload for a jsonb query parameter"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(value, default=float)
+
+
+def new_id() -> str:
+    """Time-ordered UUID (version 7) for rows the engine inserts
+    
+    The leading 48 bits are the Unix time in ms, so ids generated later sort later and new
+    bot_logs/bot_positions/bot_trades rows land at the right edge of the primary-key index
+    instead of on a random page. Still a valid uuid for the uuid columns.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), 'big')
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # Version 7
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return str(uuid.UUID(int=value))
+
+
+def postgrest_post(path: str, payload, prefer: str = 'return=minimal'):
+    """POST an orjson-encoded payload straight to PostgREST (blocking - call it from db_executor)
+    
+    supabase-py encodes request bodies with stdlib json; orjson is several times faster on the
+    float-heavy rows the engine writes. Reuses supabase-py's session and auth headers.
+    """
+    response = supabase.postgrest.session.post(
+        path,
+        content=orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY),
+        headers={'Content-Type': 'application/json', 'Prefer': prefer}
+    )
+    response.raise_for_status()
+    return response
+
+
+async def db_rpc(function: str, params: dict):
+    """Call a bot-engine SQL function (bot-engine-functions.sql) and return its result
+    
+    Goes over the asyncpg pool when configured - one pooled, prepared statement - and
+    through PostgREST (orjson-encoded when available) otherwise. Every parameter of these
+    functions is jsonb.
+    """
+    if pg_pool is not None:
+        args = ', '.join(f"{name} => ${i}::jsonb" for i, name in enumerate(params, 1))
+        return await pg_pool.fetchval(f"SELECT public.{function}({args})", *(json_dumps(v) for v in params.values()))
+    if orjson is not None:
+        response = await asyncio.get_running_loop().run_in_executor(
+            db_executor, postgrest_post, f'/rpc/{function}', params, 'return=representation'
+        )
+        return orjson.loads(response.content) if response.content else None
+    result = await db_execute(supabase.rpc(function, params))
+    return result.data
+
+
+META_TTL = 3600  # The asset universe changes on the order of days - refetch hourly
+meta_cache = {'at': 0.0, 'data': None}
+
+
+SCANNER_LEVELS_TTL = 15  # scanner_worker rewrites each coin's levels roughly every 30s
+scanner_levels_cache: Dict[str, tuple] = {}  # symbol -> (fetched_at monotonic, scanner_levels row or None)
+
+
+async def get_scanner_levels(symbols: List[str]) -> Dict[str, Optional[dict]]:
+    """scanner_levels rows by symbol, cached for SCANNER_LEVELS_TTL across all bots
+    
+    Every stale symbol is loaded in one query (raises on failure).
+    """
+    now = time.monotonic()
+    stale = [s for s in symbols if s not in scanner_levels_cache or now - scanner_levels_cache[s][0] > SCANNER_LEVELS_TTL]
+    if stale:
+        result = await db_execute(supabase.table('scanner_levels')\
+            .select('*')\
+            .in_('symbol', stale))
+        rows = {row['symbol']: row for row in result.data or []}
+        for symbol in stale:
+            scanner_levels_cache[symbol] = (now, rows.get(symbol))
+    return {s: scanner_levels_cache[s][1] for s in symbols}
+
+
+async def get_meta() -> Optional[dict]:
+    """Hyperliquid meta (asset universe), cached for META_TTL seconds across all bots"""
+    now = time.monotonic()
+    if meta_cache['data'] is None or now - meta_cache['at'] > META_TTL:
+        try:
+            meta = await hl_info({'type': 'meta'})
+            meta_cache['data'] = meta
+            meta_cache['at'] = now
+            if DEBUG_ENABLED:
+                logger.debug(f"📋 Available coins: {[asset['name'] for asset in meta['universe'][:10]]}...")  # Show first 10
+        except Exception as e:
+            logger.error(f"Failed to fetch meta: {e}")
+    return meta_cache['data']
+
+
+def candle_arrays(candles: List[dict]) -> Dict[str, np.ndarray]:
+    """Convert Hyperliquid candle dicts (string values) into one array per field
+    
+    Done once when candles enter the cache, so readers never re-parse strings and
+    reductions run over contiguous float64 arrays ('t' stays int64 open time in ms).
+    """
+    n = len(candles)
+    arrs = {f: np.fromiter((float(c[f]) for c in candles), dtype=np.float64, count=n) for f in 'ohlcv'}
+    arrs['t'] = np.fromiter((c['t'] for c in candles), dtype=np.int64, count=n)
+    return arrs
+
+
+def book_levels(levels: list, depth: int) -> np.ndarray:
+    """Top `depth` L2 levels as an (n, 2) float64 array of [price, size]
+    
+    Accepts both [[price, size], ...] and Hyperliquid's [{'px', 'sz', 'n'}, ...] level shapes.
+    """
+    levels = levels[:depth]
+    n = len(levels)
+    if n == 0:
+        return np.empty((0, 2), dtype=np.float64)
+    if isinstance(levels[0], dict):
+        return np.fromiter((float(l[k]) for l in levels for k in ('px', 'sz')), dtype=np.float64, count=2 * n).reshape(n, 2)
+    return np.asarray(levels, dtype=np.float64)[:, :2]
+
+
+def book_arrays(book: dict, depth: int) -> tuple:
+    """(bids, asks) of an L2 book snapshot as book_levels arrays, parsed once per snapshot and depth
+    
+    Memoized on the snapshot dict itself: the feed replaces snapshots rather than mutating
+    them, so every bot reading the same book shares one parse of its price strings.
+    """
+    parsed = book.setdefault('arrays', {})
+    arrs = parsed.get(depth)
+    if arrs is None:
+        levels = book['levels']
+        arrs = parsed[depth] = (book_levels(levels[0], depth), book_levels(levels[1], depth))
+    return arrs
+
+
+INTERVAL_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '8h': 28_800_000, '12h': 43_200_000,
+    '1d': 86_400_000,
+}
+
+
+def merge_candle_push(arrs: Dict[str, np.ndarray], pushed: Dict[int, dict], interval_ms: int) -> Optional[Dict[str, np.ndarray]]:
+    """Apply websocket candle pushes to cached candle arrays (window length kept constant)
+    
+    Returns new arrays, or None if the pushes don't line up with the cache (a gap, or the
+    cached last candle's final update was missed) - the caller then refetches over REST.
+    """
+    if not interval_ms or len(arrs['t']) == 0:
+        return None
+    last_t = int(arrs['t'][-1])
+    if last_t not in pushed:
+        return None
+    newer = sorted(t for t in pushed if t > last_t)
+    if any(t != last_t + (i + 1) * interval_ms for i, t in enumerate(newer)):
+        return None
+    tail = candle_arrays([pushed[last_t]] + [pushed[t] for t in newer])
+    # Drop the old last row (replaced) plus one of the oldest rows per appended candle
+    return {f: np.concatenate((a[len(newer):-1], tail[f])) for f, a in arrs.items()}
+
+
+def slice_candles(arrs: Dict[str, np.ndarray], start_time: int) -> Dict[str, np.ndarray]:
+    """View of the candles opening at or after start_time (ms) - 't' is sorted ascending"""
+    i = int(np.searchsorted(arrs['t'], start_time, side='left'))
+    return {f: a[i:] for f, a in arrs.items()}
+
+
+# Candle cache shared by every bot, so bots trading the same pair share one fetch per interval
+CANDLE_CACHE_TTL = 60  # Refetch over REST after 60s without a usable websocket push
+CANDLE_CACHE_MAX = 512  # Bound memory across all bots' (pair, interval) entries
+candle_cache: OrderedDict = OrderedDict()  # LRU of (pair, interval) -> (candle arrays, window start ms, lookback ms, fetched at)
+candle_inflight: Dict[tuple, tuple] = {}  # (pair, interval) -> (window start ms, fetch task) for REST fetches in flight
+
+
+async def fetch_candle_arrays(pair: str, interval: str, start_time: int, end_time: int) -> Dict[str, np.ndarray]:
+    """candleSnapshot over REST as candle arrays (rate limited - shared budget to avoid 429 errors)"""
+    async with candle_rate_limiter:
+        return candle_arrays(await hl_info({
+            'type': 'candleSnapshot',
+            'req': {'coin': pair, 'interval': interval, 'startTime': start_time, 'endTime': end_time}
+        }))
+
+
+def to_float(value) -> float:
+    """float(value), or 0.0 when it isn't numeric (callers drop non-positive values)"""
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def trade_flow(trades: List[dict], avg_window: int = 500, flow_window: int = 100) -> tuple:
+    """Buy/sell notional flow from Hyperliquid recent trades (newest first)
+    
+    Trades with a non-positive or non-numeric price or size are ignored. Flow (buy, sell and recent volume)
+    covers the first flow_window valid trades; the average trade notional covers the first
+    avg_window trades. Returns (buy_volume, sell_volume, recent_volume, avg_volume, trade_count).
+    """
+    trades = trades[:avg_window]
+    n = len(trades)
+    px = np.fromiter((to_float(t.get('px')) for t in trades), dtype=np.float64, count=n)
+    sz = np.fromiter((to_float(t.get('sz')) for t in trades), dtype=np.float64, count=n)
+    side = np.fromiter((t.get('side', 'B') for t in trades), dtype='<U1', count=n)
+    valid = (px > 0) & (sz > 0)
+    volumes = (px * sz)[valid]
+    flow_volumes = volumes[:flow_window]
+    flow_side = side[valid][:flow_window]
+    return (
+        float(flow_volumes[flow_side == 'B'].sum()),
+        float(flow_volumes[flow_side == 'A'].sum()),
+        float(flow_volumes.sum()),
+        float(volumes.mean()) if len(volumes) else 0.0,
+        len(flow_volumes)
+    )
+
+
+@njit(cache=True, fastmath=True)
+def depth_kernel(bids, asks):
+    """(bid_depth, ask_depth, bid/ask ratio) summed over the size column of (n, 2) level arrays
+    
+    The ratio is 0 when there's no ask depth.
+    """
+    bid_depth = 0.0
+    for i in range(bids.shape[0]):
+        bid_depth += bids[i, 1]
+    ask_depth = 0.0
+    for i in range(asks.shape[0]):
+        ask_depth += asks[i, 1]
+    ratio = bid_depth / ask_depth if ask_depth > 0 else 0.0
+    return bid_depth, ask_depth, ratio
+
+
+@njit(cache=True, fastmath=True)
+def momentum_kernel(closes):
+    """Momentum (%) of the last 5 closes vs the (up to) 5 before them, and the
+    mean absolute relative change between the last 5 closes.
+    
+    closes must be float64 with at least 6 values.
+    """
+    n = closes.shape[0]
+    recent_start = n - 5
+    older_start = max(0, n - 10)
+    
+    recent_sum = 0.0
+    for i in range(recent_start, n):
+        recent_sum += closes[i]
+    older_sum = 0.0
+    for i in range(older_start, recent_start):
+        older_sum += closes[i]
+    
+    recent_avg = recent_sum / 5
+    older_avg = older_sum / (recent_start - older_start)
+    if older_avg == 0:
+        return 0.0, 0.0
+    momentum = ((recent_avg - older_avg) / older_avg) * 100
+    
+    change_sum = 0.0
+    for i in range(recent_start + 1, n):
+        change_sum += abs(closes[i] - closes[i - 1]) / closes[i - 1]
+    volatility = change_sum / 4
+    
+    return momentum, volatility
+
+
+@njit(cache=True, fastmath=True)
+def breakout_signal(closes, current, threshold):
+    """Momentum (%) of current vs the window's first close, and the breakout signal:
+    +1 above threshold, -1 below -threshold, 0 otherwise (also when the base close is 0)
+    """
+    base = closes[0]
+    if base == 0:
+        return 0.0, 0
+    momentum = (current - base) / base * 100
+    if momentum > threshold:
+        return momentum, 1
+    if momentum < -threshold:
+        return momentum, -1
+    return momentum, 0
+
+
+@njit(cache=True)
+def position_kernel(signs, entry_prices, sizes, current_prices, stop_losses, take_profits):
+    """Mark a bot's positions and decide their exits in one pass (long = +1, short = -1)
+    
+    Returns pnl, pnl_pct, the exit code (0 hold, 1 stop loss, 2 take profit - a stop or
+    target of 0 is unset) and whether the stop is due to move to break-even (profit >= 0.15%
+    with the stop still on the losing side of entry). A break-even move never changes the exit:
+    in that much profit neither the old stop nor entry can be hit.
+    """
+    n = signs.shape[0]
+    pnls = np.empty(n)
+    pnl_pcts = np.empty(n)
+    exits = np.zeros(n, dtype=np.int64)
+    break_even = np.zeros(n, dtype=np.bool_)
+    for i in range(n):
+        side = signs[i]
+        price = current_prices[i]
+        notional = entry_prices[i] * sizes[i]
+        pnls[i] = side * (price - entry_prices[i]) * sizes[i]
+        pnl_pcts[i] = pnls[i] / notional * 100 if notional != 0 else np.nan
         
-        if not response.ok:
-            logger.warning(f"⚠️ L2 API request failed for {coin}: HTTP {response.status_code}")
-            return None
-        
-        data = response.json()
-        if data and len(data) > 0:
-            return data[0]  # Returns { coin, levels: [[price, size], ...], time }
+        sl = stop_losses[i]
+        tp = take_profits[i]
+        if sl != 0 and (price - sl) * side <= 0:
+            exits[i] = 1
+        elif tp != 0 and (price - tp) * side >= 0:
+            exits[i] = 2
+        if sl != 0 and pnl_pcts[i] >= 0.15 and (entry_prices[i] - sl) * side > 0.0001:
+            break_even[i] = True
+    return pnls, pnl_pcts, exits, break_even
+
+
+SIDE_SIGN = {'long': 1.0, 'short': -1.0}  # Position side -> P&L direction (anything but 'long' is short)
+
+
+def position_columns(positions: List[dict]) -> tuple:
+    """Column arrays (signs, entry prices, sizes, stop losses, take profits) of open positions,
+    in list order, for position_kernel - long = +1, short = -1, an unset stop/target is 0"""
+    n = len(positions)
+    return (
+        np.fromiter((SIDE_SIGN.get(p['side'], -1.0) for p in positions), dtype=np.float64, count=n),
+        np.fromiter((p['entry_price'] for p in positions), dtype=np.float64, count=n),
+        np.fromiter((p['size'] for p in positions), dtype=np.float64, count=n),
+        np.fromiter((p.get('stop_loss') or 0 for p in positions), dtype=np.float64, count=n),
+        np.fromiter((p.get('take_profit') or 0 for p in positions), dtype=np.float64, count=n),
+    )
+
+
+def hl_coin(pair: str) -> str:
+    """Hyperliquid coin name for a strategy pair ('BTCUSDT' / 'btcusd' -> 'BTC')"""
+    return pair.upper().replace('USDT', '').replace('USD', '')
+
+
+async def fetch_l2_orderbook(coin: str) -> Optional[dict]:
+    """Get L2 orderbook - websocket snapshot when fresh, shared Hyperliquid REST snapshot otherwise
+    (Python SDK doesn't have l2_book method). Pair names are normalized with hl_coin, so every
+    caller shares one cache entry per coin."""
+    coin = hl_coin(coin)
+    try:
+        return await market_stream.fetch_book(coin)
+    except aiohttp.ClientResponseError as e:
+        logger.warning(f"⚠️ L2 API request failed for {coin}: HTTP {e.status}")
         return None
     except Exception as e:
         logger.error(f"❌ Error fetching L2 orderbook for {coin}: {e}")
         return None
 
+
+class LogBuffer:
+    """Bounded in-memory buffer of bot_logs rows, flushed to Supabase in batches
+    
+    Producers never wait on the network: rows are queued and a background task
+    inserts them in chunks of up to batch_size rows (or every flush_interval seconds).
+    When the buffer is full the oldest row is dropped.
+    """
+    
+    def __init__(self, maxsize: int = 10000, batch_size: int = 200, flush_interval: float = 0.25):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0  # Rows dropped because the buffer was full
+    
+    def put(self, row: dict):
+        """Queue a bot_logs row for the next flush"""
+        row.setdefault('id', new_id())  # Every row in a batch needs the same columns
+        try:
+            self.queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.queue.get_nowait()  # Drop oldest to make room
+            self.queue.put_nowait(row)
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                logger.warning(f"⚠️ Log buffer full - dropped {self.dropped} log(s) so far")
+    
+    async def run(self):
+        """Flush queued rows forever (started by BotEngine.start)"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                if pg_pool is not None:
+                    batch = [self.render(row) for row in batch]
+                    await pg_pool.execute(
+                        "INSERT INTO public.bot_logs (id, bot_id, user_id, log_type, message, data, created_at) "
+                        "SELECT id, bot_id, user_id, log_type, message, data, created_at "
+                        "FROM jsonb_populate_recordset(NULL::public.bot_logs, $1::jsonb)",
+                        json_dumps(batch)
+                    )
+                else:
+                    await loop.run_in_executor(db_executor, self.flush_batch, batch)
+            except Exception as e:
+                logger.error(f"Failed to flush {len(batch)} log(s): {e}")
+    
+    @staticmethod
+    def render(row: dict) -> dict:
+        """Format a lazily-templated row's message (see BotInstance.log) and its epoch
+        created_at stamp - runs at flush time"""
+        created_at = row.get('created_at')
+        if isinstance(created_at, float):
+            row['created_at'] = datetime.fromtimestamp(created_at).isoformat()
+        tpl = row.pop('tpl', None)
+        if tpl is not None:
+            template, fields, echo_prefix = tpl
+            try:
+                row['message'] = template.format(**fields)
+            except (KeyError, IndexError, ValueError) as e:
+                row['message'] = template
+                logger.warning(f"Bad log template {template!r}: {e}")
+            logger.info(f"{echo_prefix}{row['message']}")
+        return row
+    
+    async def upsert(self, rows: List[dict]):
+        """Write in-place log rows (see BotInstance.log_update) in one upsert keyed by id
+        
+        A row is created if it doesn't exist yet (or was deleted) and overwritten otherwise.
+        """
+        rows = [self.render(row) for row in rows]
+        if pg_pool is not None:
+            await pg_pool.execute(
+                "INSERT INTO public.bot_logs (id, bot_id, user_id, log_type, message, data, created_at) "
+                "SELECT id, bot_id, user_id, log_type, message, data, created_at "
+                "FROM jsonb_populate_recordset(NULL::public.bot_logs, $1::jsonb) "
+                "ON CONFLICT (id) DO UPDATE SET log_type = EXCLUDED.log_type, message = EXCLUDED.message, "
+                "data = EXCLUDED.data, created_at = EXCLUDED.created_at",
+                json_dumps(rows)
+            )
+        elif orjson is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                db_executor, postgrest_post, '/bot_logs', rows, 'resolution=merge-duplicates,return=minimal'
+            )
+        else:
+            await db_execute(supabase.table('bot_logs').upsert(rows))
+    
+    @classmethod
+    def flush_batch(cls, batch: List[dict]):
+        """Render and insert one batch (runs in db_executor, off the event loop)"""
+        batch = [cls.render(row) for row in batch]
+        if orjson is not None:
+            postgrest_post('/bot_logs', batch)
+        else:
+            supabase.table('bot_logs').insert(batch).execute()
+
+
+log_buffer = LogBuffer()
+
 logger.info("🚀 Bot Engine Starting...")
 
+# Bots keep their open positions in memory (open_position appends, close_position removes);
+# the DB is only re-read this often, to pick up closes/edits made outside the engine
+POSITION_SYNC_INTERVAL = 30
+
+TICK_INTERVAL = 1.0  # Seconds between engine tick starts
+
+# Bot status/config changes (start, stop, strategy edits) are picked up within this many seconds;
+# in between, ticks reuse the last running-bots poll instead of re-querying every second
+BOTS_POLL_INTERVAL = 10
+
+
 class BotEngine:
     """Main bot engine orchestrator"""
     
+    __slots__ = (
+        'running_bots', 'log_flush_task', 'active_bot_ids', 'bot_semaphore',
+        'last_positions_sync', 'bots', 'bots_fetched_at',
+    )
+    
     def __init__(self):
         self.running_bots: Dict[str, 'BotInstance'] = {}
+        self.log_flush_task: Optional[asyncio.Task] = None
+        self.active_bot_ids: frozenset = frozenset()  # Running bot ids as of the last poll
+        self.bot_semaphore = asyncio.Semaphore(32)  # Max bots ticking at once (bounds burst load on Hyperliquid/Supabase)
+        self.last_positions_sync: float = 0  # Monotonic time of the last bulk position load
+        self.bots: Optional[List[dict]] = None  # Running bots + strategies as of the last poll
+        self.bots_fetched_at: float = 0  # Monotonic time of the last running-bots poll
         
     async def start(self):
         """Start the bot engine"""
         logger.info("🔥 Bot Engine: Initializing...")
         
+        # Direct Postgres pool for hot writes (optional, see DATABASE_URL)
+        await init_pg_pool()
+        
+        # Background writer for buffered bot_logs inserts
+        self.log_flush_task = asyncio.create_task(log_buffer.run())
+        
         # Initialize Hyperliquid Info client for market data
         logger.info("📡 Connecting to Hyperliquid API...")
         
-        # Main loop
+        # Main loop - fixed 1s cadence measured from tick start (not 1s of sleep after each tick);
+        # a tick that overruns is followed straight away, but missed ticks are never caught up
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
         while True:
             try:
                 await self.tick()
-                await asyncio.sleep(1)  # Run every second
             except Exception as e:
                 logger.error(f"❌ Bot Engine error: {e}")
                 await asyncio.sleep(5)
+                next_tick = loop.time()
+                continue
+            
+            next_tick += TICK_INTERVAL
+            delay = next_tick - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                if delay < -5:
+                    logger.warning(f"⏱️ Tick overran by {-delay:.2f}s - skipping missed ticks")
+                next_tick = loop.time()
     
     async def tick(self):
         """Run one tick of the bot engine"""
-        # Fetch all running bots from Supabase
-        try:
-            result = supabase.table('bot_instances')\
-                .select('*, strategies(*)')\
-                .eq('status', 'running')\
-                .execute()
-            
-            bots = result.data if result.data else []
-            logger.info(f"🔍 Found {len(bots)} active bot(s)")
-            
-            if len(bots) == 0:
-                return  # No bots to run
-        except Exception as e:
-            logger.error(f"Failed to fetch bots from Supabase: {e}")
-            return
+        now = time.monotonic()
+        wall = time.time()
+        clock = (now, int(wall * 1000), datetime.fromtimestamp(wall).isoformat())  # One clock for every bot this tick
         
-        # Update last_tick_at for all bots
-        for bot_data in bots:
-            bot_id = bot_data['id']
-            
-            # Create bot instance if not exists
-            if bot_id not in self.running_bots:
-                self.running_bots[bot_id] = BotInstance(bot_data)
+        # Fetch all running bots (with their strategy config) from Supabase every BOTS_POLL_INTERVAL
+        if self.bots is None or now - self.bots_fetched_at >= BOTS_POLL_INTERVAL:
+            try:
+                result = await db_execute(supabase.table('bot_instances')\
+                    .select('*, strategies(*)')\
+                    .eq('status', 'running'))
+                
+                self.bots = result.data if result.data else []
+                self.bots_fetched_at = now
+                if DEBUG_ENABLED:
+                    await get_meta()  # Asset universe is only logged (once per META_TTL) - keep it off the tick path otherwise
+                    logger.debug(f"🔍 Found {len(self.bots)} active bot(s)")
+            except Exception as e:
+                logger.error(f"Failed to fetch bots from Supabase: {e}")
+                return
+        bots = self.bots
+        
+        bot_ids = [b['id'] for b in bots]
+        
+        # Remove stopped bots - only when the running set actually changed
+        active_bot_ids = frozenset(bot_ids)
+        if active_bot_ids != self.active_bot_ids:
+            for bot_id in self.running_bots.keys() - active_bot_ids:
+                logger.info(f"🛑 Stopping bot: {bot_id}")
+                del self.running_bots[bot_id]
+            self.active_bot_ids = active_bot_ids
+        
+        if len(bots) == 0:
+            return  # No bots to run
+        
+        # Reconcile open positions for every bot in one query (instead of one SELECT per bot) -
+        # every POSITION_SYNC_INTERVAL, or right away when a new bot needs its initial state
+        positions_by_bot: Optional[Dict[str, List[dict]]] = None
+        if now - self.last_positions_sync >= POSITION_SYNC_INTERVAL or not self.running_bots.keys() >= active_bot_ids:
+            try:
+                result = await db_execute(supabase.table('bot_positions')\
+                    .select('*')\
+                    .in_('bot_id', bot_ids)\
+                    .eq('status', 'open'))
+                
+                positions_by_bot = {bot_id: [] for bot_id in bot_ids}
+                for position in result.data or []:
+                    positions_by_bot.setdefault(position['bot_id'], []).append(position)
+                self.last_positions_sync = now
+            except Exception as e:
+                logger.warning(f"Failed to bulk-load positions, bots will load their own: {e}")
+        
+        # Market data shared by every bot this tick: one mids snapshot, and the books of every
+        # orderbook-strategy pair warmed concurrently (websocket when fresh, else one REST call per coin)
+        await market_stream.ensure_connected()
+        all_mids = await market_stream.fetch_mids()
+        book_coins = {
+            hl_coin(pair)
+            for b in bots if (b.get('strategies') or {}).get('type') in ('orderbook_imbalance', 'orderbook_imbalance_v2')
+            for pair in b['strategies'].get('pairs', []) if isinstance(pair, str)
+        }
+        if book_coins:
+            await asyncio.gather(*(fetch_l2_orderbook(coin) for coin in book_coins))
+        
+        # Run all bots concurrently - their ticks are almost entirely network I/O
+        results = await asyncio.gather(*(
+            self.run_bot(bot_data, positions_by_bot.get(bot_data['id'], []) if positions_by_bot is not None else None, all_mids, clock)
+            for bot_data in bots
+        ), return_exceptions=True)
+        ticked_bot_ids = [bot_data['id'] for bot_data, ok in zip(bots, results) if ok is True]
+        
+        # Write every bot's position marks (current_price / unrealized_pnl) in one RPC
+        position_rows = []
+        queued_marks = []
+        for bot in self.running_bots.values():
+            if bot.pending_position_updates:
+                queued_marks.append((bot, bot.pending_position_updates))
+                position_rows.extend(bot.pending_position_updates.values())
+                bot.pending_position_updates = {}
+        if position_rows:
+            try:
+                await db_rpc('bulk_update_positions', {'p_rows': position_rows})
+            except Exception as e:
+                logger.error(f"Failed to update {len(position_rows)} position(s): {e}")
+                # Re-queue the marks (newer ones win) - check_positions only queues a mark when the price moves
+                for bot, marks in queued_marks:
+                    bot.pending_position_updates = {**marks, **bot.pending_position_updates}
+        
+        # Write every bot's in-place log rows (position status, monitoring, market metrics) in one upsert
+        log_rows = []
+        for bot in self.running_bots.values():
+            log_rows.extend(bot.pending_log_updates.values())
+            bot.pending_log_updates.clear()
+        if log_rows:
+            try:
+                await log_buffer.upsert(log_rows)
+            except Exception as e:
+                logger.error(f"Failed to update {len(log_rows)} log(s): {e}")
+        
+        # Update last_tick_at for all bots that ticked, in a single UPDATE
+        if ticked_bot_ids:
+            try:
+                if pg_pool is not None:
+                    await pg_pool.execute(
+                        "UPDATE public.bot_instances SET last_tick_at = $2::text::timestamptz WHERE id = ANY($1::text[])",
+                        ticked_bot_ids, clock[2]  # Same ISO timestamp the PostgREST path writes
+                    )
+                else:
+                    await db_execute(supabase.table('bot_instances')\
+                        .update({'last_tick_at': clock[2]})\
+                        .in_('id', ticked_bot_ids))
+            except Exception as e:
+                logger.error(f"Failed to update last_tick_at: {e}")
+    
+    async def run_bot(self, bot_data: dict, positions: Optional[List[dict]], all_mids: Optional[Dict[str, str]] = None,
+                      clock: Optional[tuple] = None) -> bool:
+        """Run one bot's tick - returns True if it completed without error"""
+        bot_id = bot_data['id']
+        
+        try:
+            # Create bot instance if not exists (a bad strategy config raises here - report it like a tick error)
+            bot = self.running_bots.get(bot_id)
+            if bot is None:
+                bot = self.running_bots[bot_id] = BotInstance(bot_data)
                 logger.info(f"✅ Loaded bot: {bot_data['name']} ({bot_id})")
             
             # Update bot data
-            self.running_bots[bot_id].update_config(bot_data)
+            bot.update_config(bot_data)
             
             # Run bot tick
-            try:
-                await self.running_bots[bot_id].tick()
-                
-                # Update last_tick_at in database
-                supabase.table('bot_instances')\
-                    .update({'last_tick_at': datetime.now().isoformat()})\
-                    .eq('id', bot_id)\
-                    .execute()
-                    
-            except Exception as e:
-                logger.error(f"❌ Error running bot {bot_id}: {e}")
-                await self.log_bot_activity(
-                    bot_id,
-                    bot_data['user_id'],
-                    'error',
-                    f'Bot tick error: {str(e)}',
-                    {'error': str(e)}
-                )
-        
-        # Remove stopped bots
-        active_bot_ids = {b['id'] for b in bots}
-        stopped_bots = set(self.running_bots.keys()) - active_bot_ids
-        for bot_id in stopped_bots:
-            logger.info(f"🛑 Stopping bot: {bot_id}")
-            del self.running_bots[bot_id]
+            async with self.bot_semaphore:
+                await bot.tick(positions, all_mids, clock)
+            return True
+        except Exception as e:
+            logger.error(f"❌ Error running bot {bot_id}: {e}")
+            await self.log_bot_activity(
+                bot_id,
+                bot_data['user_id'],
+                'error',
+                f'Bot tick error: {str(e)}',
+                {'error': str(e)}
+            )
+            return False
     
     async def log_bot_activity(self, bot_id: str, user_id: str, log_type: str, message: str, data: dict):
-        """Log bot activity to Supabase"""
+        """Log bot activity to Supabase (buffered, flushed in batches)"""
         try:
-            supabase.table('bot_logs').insert({
+            log_buffer.put({
                 'bot_id': bot_id,
                 'user_id': user_id,
                 'log_type': log_type,
                 'message': message,
                 'data': data,
-                'created_at': datetime.now().isoformat()
-            }).execute()
+                'created_at': time.time()  # ISO-formatted at flush time by LogBuffer.render
+            })
         except Exception as e:
             logger.error(f"Failed to log activity: {e}")
 
@@ -155,6 +1092,43 @@ class BotEngine:
 class BotInstance:
     """Individual bot instance"""
     
+    # One instance per running bot - fixed slots instead of a per-instance __dict__.
+    # Any new attribute set in __init__/resolve_risk_params must be listed here.
+    __slots__ = (
+        'bot_id', 'user_id', 'name', 'mode', 'strategy',
+        'positions', 'positions_by_symbol', 'position_columns', 'pending_position_updates', 'positions_synced_at', 'last_prices',
+        'now_mono', 'now_ms', 'now_iso',
+        'last_analysis_log_time', 'last_market_metrics_log_time', 'market_log_interval',
+        'position_log_ids', 'monitoring_log_ids', 'market_metrics_log_ids', 'pending_log_updates',
+        'last_position_update_time', 'last_market_metrics_update_time', 'last_position_close_time',
+        'position_cooldown', 'position_metadata',
+        'liquidity_grab_events', 'liquidity_grab_timeout', 'last_liquidity_grab_check',
+        'last_support_liquidity_check', 'liquidity_grab_check_interval',
+        'orderbook_v2_last_trade_time', 'orderbook_v2_position_open_time',
+        'error_limiter', 'suppressed_errors', 'run_strategy',
+        'position_size_usd', 'take_profit_pct', 'sl_mult_long', 'tp_mult_long', 'sl_mult_short', 'tp_mult_short',
+    )
+    
+    # In-place log_update messages (position status, multi-timeframe metrics/monitoring), filled with
+    # format_map (level fields from level_fields) only when the throttled update is actually written
+    METRICS_TEMPLATE = (
+        "📊 {pair} | ${price:.2f} | 1h: ${high_1h:.2f}/${low_1h:.2f} ({high_1h_dist:+.3f}%/{low_1h_dist:+.3f}%) | "
+        "30m: ${high_30m:.2f}/${low_30m:.2f} ({high_30m_dist:+.3f}%/{low_30m_dist:+.3f}%) | "
+        "15m: ${high_15m:.2f}/${low_15m:.2f} ({high_15m_dist:+.3f}%/{low_15m_dist:+.3f}%) | "
+        "Vol: {volume_weight:.2f}x | Trend: {trend}"
+    )
+    POSITION_TEMPLATE = (
+        "📊 {emoji} {side} {pair} | Entry: ${entry_price:.2f} → ${current_price:.2f} | TP: {tp} | SL: {sl} | "
+        "P&L: ${pnl:.2f} ({pnl_pct:+.2f}%)"
+    )
+    MONITOR_TEMPLATE = (
+        "👁️ Monitoring {pair} | Price: ${price:.2f} | {nearest_level} | "
+        "1h: ${high_1h:.2f}/${low_1h:.2f} ({high_1h_dist:+.2f}%/{low_1h_dist:+.2f}%) | "
+        "30m: ${high_30m:.2f}/${low_30m:.2f} ({high_30m_dist:+.2f}%/{low_30m_dist:+.2f}%) | "
+        "15m: ${high_15m:.2f}/${low_15m:.2f} ({high_15m_dist:+.2f}%/{low_15m_dist:+.2f}%) | "
+        "Vol: {volume_weight:.2f}x | Trend: {trend}"
+    )
+    
     def __init__(self, bot_data: dict):
         self.bot_id = bot_data['id']
         self.user_id = bot_data['user_id']
@@ -162,21 +1136,25 @@ class BotInstance:
         self.mode = bot_data['mode']
         self.strategy = bot_data['strategies']
         self.positions: List[dict] = []
+        self.positions_by_symbol: Dict[str, dict] = {}  # symbol -> position from self.positions - keep in sync whenever positions change
+        self.position_columns: Optional[tuple] = None  # position_columns(self.positions), rebuilt lazily - reset whenever positions change
+        self.pending_position_updates: Dict[str, dict] = {}  # position id -> {id, current_price, unrealized_pnl}, flushed by BotEngine.tick
+        self.positions_synced_at: float = float('-inf')  # Monotonic time positions were last loaded from the DB
         self.last_prices: Dict[str, float] = {}
-        self.candle_cache: Dict[str, dict] = {}  # Cache candles to avoid rate limits
-        self.last_candle_fetch: Dict[str, float] = {}  # Track last fetch time per pair
-        self.candle_cache_ttl = 60  # Cache candles for 60 seconds (increased from 30)
-        self.last_analysis_log_time: float = 0  # Track last detailed analysis log
-        self.last_market_metrics_log_time: float = 0  # Separate timer for market metrics (per pair)
+        # Clock captured once per tick and shared by every strategy/DB write in that tick
+        wall = time.time()
+        self.now_mono: float = time.monotonic()  # Interval timers (throttles, cooldowns, TTLs)
+        self.now_ms: int = int(wall * 1000)  # Wall clock in ms for candle windows
+        self.now_iso: str = datetime.fromtimestamp(wall).isoformat()  # Wall clock for DB timestamps
+        self.last_analysis_log_time: float = float('-inf')  # Track last detailed analysis log
+        self.last_market_metrics_log_time: float = float('-inf')  # Separate timer for market metrics (per pair)
         self.market_log_interval = 30  # Log market data every 30 seconds
         self.position_log_ids: Dict[str, str] = {}  # Track position status log IDs per pair (for updating in place)
         self.monitoring_log_ids: Dict[str, str] = {}  # Track monitoring log IDs per pair (for updating in place)
         self.market_metrics_log_ids: Dict[str, str] = {}  # Track market metrics log IDs per pair (for updating in place)
+        self.pending_log_updates: Dict[str, dict] = {}  # log id -> full bot_logs row, upserted by BotEngine.tick
         self.last_position_update_time: Dict[str, float] = {}  # Track last position update time per pair (update every 5s)
         self.last_market_metrics_update_time: Dict[str, float] = {}  # Track last market metrics update time per pair
-        self.last_market_data_fetch: float = 0  # Track last market data fetch time
-        self.cached_market_data: dict = {}  # Cache market data to avoid rate limits
-        self.market_data_cache_ttl = 2  # Cache market data for 2 seconds
         self.last_position_close_time: Dict[str, float] = {}  # Track when positions were closed (cooldown period)
         self.position_cooldown = 60  # Wait 60 seconds after closing before opening new position on same pair
         self.position_metadata: Dict[str, dict] = {}  # Track per-position metadata for risk management
@@ -189,75 +1167,137 @@ class BotInstance:
         self.liquidity_grab_events: Dict[str, dict] = {}  # Track wick events per pair for liquidity grab strategy
         # Structure: {'pair': {'wick_time': float, 'support_level': float, 'support_tf': str, 'wick_price': float}}
         self.liquidity_grab_timeout = 600  # 10 minutes (600 seconds) timeout for bounce - extended for more opportunities
-        self.last_liquidity_grab_check: float = 0  # Track last liquidity grab check time
+        self.last_liquidity_grab_check: float = float('-inf')  # Track last liquidity grab check time
+        self.last_support_liquidity_check: float = float('-inf')  # Track last support liquidity check time (runs every 5s)
         self.liquidity_grab_check_interval = 5  # Check every 5 seconds (don't need to check every second)
         self.orderbook_v2_last_trade_time: Dict[str, float] = {}  # Track last trade time per pair for v2 strategy
         self.orderbook_v2_position_open_time: Dict[str, float] = {}  # Track when positions were opened for v2 strategy
+        self.error_limiter = AsyncTokenBucket(rate=1, capacity=5)  # Full error reports (traceback + bot_logs row) per second
+        self.suppressed_errors = 0  # Errors reported as one console line because error_limiter was empty
+        self.run_strategy = self.resolve_strategy()  # Re-resolved by update_config if the type changes
+        self.resolve_risk_params()
         
     def update_config(self, bot_data: dict):
         """Update bot configuration"""
+        strategy_type = self.strategy['type']
         self.strategy = bot_data['strategies']
+        if self.strategy['type'] != strategy_type:
+            self.run_strategy = self.resolve_strategy()
+        self.resolve_risk_params()
+    
+    def resolve_risk_params(self):
+        """Position size and SL/TP price multipliers from the strategy config (once per config, not per fill)"""
+        self.position_size_usd = float(self.strategy['position_size'])
+        self.take_profit_pct = float(self.strategy['take_profit_percent'])
+        sl = float(self.strategy['stop_loss_percent']) * 0.01
+        tp = self.take_profit_pct * 0.01
+        self.sl_mult_long, self.tp_mult_long = 1 - sl, 1 + tp
+        self.sl_mult_short, self.tp_mult_short = 1 + sl, 1 - tp
+    
+    def resolve_strategy(self):
+        """Bound runner for the configured strategy type (resolved once, not per tick)"""
+        runners = {
+            'orderbook_imbalance': self.run_orderbook_imbalance_strategy,
+            'orderbook_imbalance_v2': self.run_orderbook_imbalance_v2_strategy,
+            'momentum_breakout': self.run_momentum_breakout_strategy,
+            'multi_timeframe_breakout': self.run_multi_timeframe_breakout_strategy,
+            'liquidity_grab': self.run_liquidity_grab_strategy,
+            'support_liquidity': self.run_support_liquidity_strategy,
+        }
+        return runners.get(self.strategy['type'], self.run_default_strategy)
     
     async def get_candles_cached(self, pair: str, interval: str, start_time: int, end_time: int):
-        """Fetch candles with caching to avoid rate limits"""
-        # Use a more stable cache key that doesn't change every second
-        # Round start_time to nearest minute to improve cache hit rate
-        start_time_rounded = (start_time // 60000) * 60000  # Round to nearest minute
-        cache_key = f"{pair}_{interval}_{start_time_rounded}"
-        current_time = datetime.now().timestamp()
+        """Fetch candles with caching to avoid rate limits
+        
+        Cached per (pair, interval) in the module-level candle_cache shared by all bots: the
+        entry holds the widest lookback any caller has asked for, and shorter windows on the
+        same interval are sliced out of it, so one fetch per (pair, interval) serves every
+        caller until the TTL expires. Bots that miss at the same time await the same fetch.
         
-        # Check if we have cached data
-        if cache_key in self.candle_cache:
-            last_fetch = self.last_candle_fetch.get(cache_key, 0)
-            if current_time - last_fetch < self.candle_cache_ttl:
-                logger.debug(f"Using cached candles for {pair} {interval}")
-                return self.candle_cache[cache_key]
+        Between fetches the cache is kept current from the websocket candle feed; REST is
+        only hit on first use, when pushes stop (TTL), or when the pushes leave a gap.
+        
+        Returns a dict of numpy arrays keyed 'o', 'h', 'l', 'c', 'v', 't' (see candle_arrays),
+        or None if nothing could be fetched.
+        """
+        cache_key = (pair, interval)
+        lookback = end_time - start_time
+        current_time = self.now_mono
         
-        # Add rate limiting delay (1.5 seconds between calls to avoid 429 errors)
-        await asyncio.sleep(1.5)
+        # Check if we have cached data covering this window
+        cached = candle_cache.get(cache_key)
+        if cached is not None:
+            candles, cached_start, cached_lookback, last_fetch = cached
+            push = market_stream.get_candles(pair, interval)
+            if push is not None and push[0] > last_fetch:
+                merged = merge_candle_push(candles, push[1], INTERVAL_MS.get(interval))
+                if merged is not None:
+                    cached_start += int(merged['t'][-1]) - int(candles['t'][-1])  # Window slid forward
+                    candles, last_fetch = merged, push[0]
+                    candle_cache[cache_key] = (candles, cached_start, cached_lookback, last_fetch)
+            if current_time - last_fetch < CANDLE_CACHE_TTL and cached_start <= start_time:
+                if DEBUG_ENABLED:
+                    logger.debug(f"Using cached candles for {pair} {interval}")
+                candle_cache.move_to_end(cache_key)
+                return slice_candles(candles, start_time)
+            # Re-fetch wide enough for every caller of this interval
+            lookback = max(lookback, cached_lookback)
+        
+        fetch_start = end_time - lookback
         
         try:
-            candles = info.candles_snapshot(pair, interval, start_time, end_time)
+            # Join another bot's fetch of this (pair, interval) if it covers our window
+            inflight = candle_inflight.get(cache_key)
+            if inflight is not None and inflight[0] <= start_time:
+                return slice_candles(await asyncio.shield(inflight[1]), start_time)
+            
+            task = asyncio.ensure_future(fetch_candle_arrays(pair, interval, fetch_start, end_time))
+            candle_inflight[cache_key] = (fetch_start, task)
+            try:
+                candles = await asyncio.shield(task)  # Cancelling one waiter mustn't cancel the others' fetch
+            finally:
+                if candle_inflight.get(cache_key, (None, None))[1] is task:
+                    del candle_inflight[cache_key]
             
-            # Cache the result
-            self.candle_cache[cache_key] = candles
-            self.last_candle_fetch[cache_key] = current_time
+            # Keep it current from the websocket between fetches
+            market_stream.subscribe_candles(pair, interval)
             
-            return candles
+            # Cache the result, evicting the least recently used entries over the cap
+            candle_cache[cache_key] = (candles, fetch_start, lookback, current_time)
+            candle_cache.move_to_end(cache_key)
+            while len(candle_cache) > CANDLE_CACHE_MAX:
+                candle_cache.popitem(last=False)
+            
+            return slice_candles(candles, start_time)
         except Exception as e:
             logger.error(f"Error fetching candles for {pair}: {e}")
             # Return cached data if available, even if expired
-            if cache_key in self.candle_cache:
+            if cached is not None:
                 logger.warning(f"Using stale cache for {pair} due to API error")
-                return self.candle_cache[cache_key]
+                return slice_candles(cached[0], start_time)
             return None
     
-    async def tick(self):
-        """Run one tick of this bot"""
-        # Fetch current prices with caching to avoid rate limits
-        current_time = datetime.now().timestamp()
-        all_mids = {}
+    async def tick(self, positions: Optional[List[dict]] = None, all_mids: Optional[Dict[str, str]] = None,
+                   clock: Optional[tuple] = None):
+        """Run one tick of this bot
         
-        # Check cache first
-        if current_time - self.last_market_data_fetch < self.market_data_cache_ttl:
-            all_mids = self.cached_market_data
-            logger.debug(f"Using cached market data (age: {current_time - self.last_market_data_fetch:.1f}s)")
-        else:
-            # Fetch fresh data
-            try:
-                all_mids = info.all_mids()
-                self.cached_market_data = all_mids
-                self.last_market_data_fetch = current_time
-                logger.debug(f"Fetched fresh market data")
-            except Exception as e:
-                logger.error(f"Failed to fetch Hyperliquid prices: {e}")
-                # Use cached data if available, even if expired
-                if self.cached_market_data:
-                    logger.warning(f"Using stale cache due to API error: {e}")
-                    all_mids = self.cached_market_data
-                else:
-                    await self.log('error', f"❌ Failed to fetch market data: {str(e)}", {})
-                    return
+        Args:
+            positions: Open positions synced by the engine (None keeps the in-memory positions,
+                reloading them here once they're older than POSITION_SYNC_INTERVAL)
+            all_mids: Mid prices shared by the engine for this tick (fetched here if None)
+            clock: (monotonic, wall ms, ISO timestamp) shared by the engine for this tick (read here if None)
+        """
+        if clock is None:
+            wall = time.time()
+            clock = (time.monotonic(), int(wall * 1000), datetime.fromtimestamp(wall).isoformat())
+        self.now_mono, self.now_ms, self.now_iso = clock
+        
+        # Prices come from the websocket feed; a shared REST snapshot is only a fallback
+        if all_mids is None:
+            all_mids = await market_stream.fetch_mids()
+            if all_mids is None:
+                await self.log('error', "❌ Failed to fetch market data", {})
+                return
         
         # Update last prices
         for pair in self.strategy['pairs']:
@@ -266,30 +1306,19 @@ class BotInstance:
         
         # Market snapshot removed - not needed, market metrics log shows all the info
         
-        # Load open positions
-        result = supabase.table('bot_positions')\
-            .select('*')\
-            .eq('bot_id', self.bot_id)\
-            .eq('status', 'open')\
-            .execute()
+        # Open positions are kept in memory; the engine re-syncs them from the DB periodically
+        if positions is None and self.now_mono - self.positions_synced_at >= POSITION_SYNC_INTERVAL:
+            result = await db_execute(supabase.table('bot_positions')\
+                .select('*')\
+                .eq('bot_id', self.bot_id)\
+                .eq('status', 'open'))
+            positions = result.data if result.data else []
         
-        self.positions = result.data if result.data else []
+        if positions is not None:
+            self.sync_positions(positions)
         
         # Run strategy
-        if self.strategy['type'] == 'orderbook_imbalance':
-            await self.run_orderbook_imbalance_strategy()
-        elif self.strategy['type'] == 'orderbook_imbalance_v2':
-            await self.run_orderbook_imbalance_v2_strategy()
-        elif self.strategy['type'] == 'momentum_breakout':
-            await self.run_momentum_breakout_strategy()
-        elif self.strategy['type'] == 'multi_timeframe_breakout':
-            await self.run_multi_timeframe_breakout_strategy()
-        elif self.strategy['type'] == 'liquidity_grab':
-            await self.run_liquidity_grab_strategy()
-        elif self.strategy['type'] == 'support_liquidity':
-            await self.run_support_liquidity_strategy()
-        else:
-            await self.run_default_strategy()
+        await self.run_strategy()
         
         # Check existing positions
         await self.check_positions()
@@ -300,24 +1329,18 @@ class BotInstance:
             await self.log('info', f"⚠️ Max positions reached ({self.strategy['max_positions']})", {})
             return
         
-        # Get available coins from meta
-        try:
-            meta = info.meta()
-            available_coins = [asset['name'] for asset in meta['universe']]
-            logger.info(f"📋 Available coins: {available_coins[:10]}...")  # Show first 10
-        except Exception as e:
-            logger.error(f"Failed to fetch meta: {e}")
-        
-        logger.info(f"🔍 Analyzing orderbook for pairs: {self.strategy['pairs']}")
+        if DEBUG_ENABLED:
+            logger.debug(f"🔍 Analyzing orderbook for pairs: {self.strategy['pairs']}")
         for pair in self.strategy['pairs']:
             # Skip if already have position
-            if any(p['symbol'] == pair for p in self.positions):
+            if pair in self.positions_by_symbol:
                 continue
             
             # Get L2 order book
             try:
-                logger.debug(f"Fetching L2 orderbook for {pair}...")
-                l2_data = fetch_l2_orderbook(pair)
+                if DEBUG_ENABLED:
+                    logger.debug(f"Fetching L2 orderbook for {pair}...")
+                l2_data = await fetch_l2_orderbook(pair)
                 
                 if not l2_data:
                     logger.warning(f"⚠️ Failed to fetch orderbook for {pair}")
@@ -334,39 +1357,41 @@ class BotInstance:
                     continue
                 
                 # Calculate order book imbalance
-                bid_depth = sum(float(level[1]) for level in bids[:10])
-                ask_depth = sum(float(level[1]) for level in asks[:10])
+                bids_arr, asks_arr = book_arrays(l2_data, 10)
+                bid_depth, ask_depth, imbalance_ratio = depth_kernel(bids_arr, asks_arr)
+                best_bid = float(bids_arr[0, 0])
+                best_ask = float(asks_arr[0, 0])
                 
                 total_depth = bid_depth + ask_depth
                 if total_depth == 0:
                     continue
                 
-                imbalance_ratio = bid_depth / ask_depth if ask_depth > 0 else 0
-                
                 # Log order book analysis (only every 30 seconds to avoid spam)
-                current_time = datetime.now().timestamp()
+                current_time = self.now_mono
                 if current_time - self.last_analysis_log_time >= self.market_log_interval:
+                    data = {
+                        'pair': pair,
+                        'bid_depth': bid_depth,
+                        'ask_depth': ask_depth,
+                        'imbalance_ratio': imbalance_ratio,
+                        'best_bid': best_bid,
+                        'best_ask': best_ask
+                    }
                     await self.log(
                         'market_data',
-                        f"📊 {pair} Order Book | Bid: {bid_depth:.2f} ({bid_depth/total_depth*100:.1f}%) | Ask: {ask_depth:.2f} ({ask_depth/total_depth*100:.1f}%) | Ratio: {imbalance_ratio:.2f}x",
-                        {
-                            'pair': pair,
-                            'bid_depth': bid_depth,
-                            'ask_depth': ask_depth,
-                            'imbalance_ratio': imbalance_ratio,
-                            'best_bid': float(bids[0][0]),
-                            'best_ask': float(asks[0][0])
-                        }
+                        "📊 {pair} Order Book | Bid: {bid_depth:.2f} ({bid_pct:.1f}%) | Ask: {ask_depth:.2f} ({ask_pct:.1f}%) | Ratio: {imbalance_ratio:.2f}x",
+                        data,
+                        fmt=dict(data, bid_pct=bid_depth / total_depth * 100, ask_pct=ask_depth / total_depth * 100)
                     )
                     self.last_analysis_log_time = current_time
                 
                 # Entry signals
                 if imbalance_ratio > 3.0:  # Strong buy pressure
-                    success = await self.open_position(pair, 'long', float(asks[0][0]))
+                    success = await self.open_position(pair, 'long', best_ask)
                     if success:
                         await self.log('signal', f"🟢 LONG signal: {pair} - Strong bid pressure ({imbalance_ratio:.2f}x)", {})
                 elif imbalance_ratio < 0.33:  # Strong sell pressure
-                    success = await self.open_position(pair, 'short', float(bids[0][0]))
+                    success = await self.open_position(pair, 'short', best_bid)
                     if success:
                         await self.log('signal', f"🔴 SHORT signal: {pair} - Strong ask pressure ({imbalance_ratio:.2f}x)", {})
                     
@@ -382,25 +1407,29 @@ class BotInstance:
         min_hold_time = params.get('min_hold_time', self.strategy.get('min_hold_time', 30))  # Default 30 seconds
         cooldown_period = params.get('cooldown_period', self.strategy.get('cooldown_period', 60))  # Default 60 seconds
         
-        logger.debug(f"📊 OrderBook V2 Parameters: threshold={imbalance_threshold}, depth={depth}, min_hold={min_hold_time}s, cooldown={cooldown_period}s")
+        if DEBUG_ENABLED:
+            logger.debug(f"📊 OrderBook V2 Parameters: threshold={imbalance_threshold}, depth={depth}, min_hold={min_hold_time}s, cooldown={cooldown_period}s")
         
-        current_time = datetime.now().timestamp()
+        current_time = self.now_mono
         
-        logger.info(f"🔍 Orderbook Imbalance V2 | Positions: {len(self.positions)}/{self.strategy['max_positions']} | Pairs: {self.strategy['pairs']}")
+        if DEBUG_ENABLED:
+            logger.debug(f"🔍 Orderbook Imbalance V2 | Positions: {len(self.positions)}/{self.strategy['max_positions']} | Pairs: {self.strategy['pairs']}")
         
         for pair_raw in self.strategy['pairs']:
             # Normalize pair to Hyperliquid format (e.g., "BTC" not "BTCUSDT")
-            pair = pair_raw.upper().replace('USDT', '').replace('USD', '') if isinstance(pair_raw, str) else str(pair_raw).upper()
-            logger.debug(f"📋 Processing pair: {pair} (raw: {pair_raw}, from strategy: {self.strategy['pairs']})")
+            pair = hl_coin(pair_raw) if isinstance(pair_raw, str) else str(pair_raw).upper()
+            if DEBUG_ENABLED:
+                logger.debug(f"📋 Processing pair: {pair} (raw: {pair_raw}, from strategy: {self.strategy['pairs']})")
             
             # Skip if already have position (exit logic is handled in check_positions)
             # Check both normalized and raw pair for position matching
-            has_open_position = any(p['symbol'] == pair or p['symbol'] == pair_raw for p in self.positions)
+            has_open_position = pair in self.positions_by_symbol or pair_raw in self.positions_by_symbol
             
             # Get L2 order book (always fetch, even during cooldown, for exit checks)
             try:
-                logger.debug(f"📖 Fetching orderbook for {pair}...")
-                l2_data = fetch_l2_orderbook(pair)
+                if DEBUG_ENABLED:
+                    logger.debug(f"📖 Fetching orderbook for {pair}...")
+                l2_data = await fetch_l2_orderbook(pair)
                 
                 if not l2_data:
                     logger.warning(f"⚠️ {pair} Failed to fetch orderbook")
@@ -417,11 +1446,12 @@ class BotInstance:
                     logger.warning(f"⚠️ {pair} Empty bids/asks - Bids: {len(bids) if bids else 0}, Asks: {len(asks) if asks else 0}")
                     continue
                 
-                logger.debug(f"✅ {pair} Orderbook fetched: {len(bids)} bids, {len(asks)} asks")
+                if DEBUG_ENABLED:
+                    logger.debug(f"✅ {pair} Orderbook fetched: {len(bids)} bids, {len(asks)} asks")
                 
                 # Calculate order book imbalance (percentage-based) - matches tkinter app exactly
-                bid_volume = sum(float(level[1]) for level in bids[:depth])
-                ask_volume = sum(float(level[1]) for level in asks[:depth])
+                bids_arr, asks_arr = book_arrays(l2_data, depth)
+                bid_volume, ask_volume, _ = depth_kernel(bids_arr, asks_arr)
                 total_volume = bid_volume + ask_volume
                 
                 if total_volume == 0:
@@ -430,29 +1460,33 @@ class BotInstance:
                 
                 imbalance_ratio = bid_volume / total_volume  # 0.0 to 1.0 (percentage) - matches tkinter app
                 
-                logger.debug(f"📊 {pair} Orderbook calc: Bid={bid_volume:.2f}, Ask={ask_volume:.2f}, Total={total_volume:.2f}, Imbalance={imbalance_ratio*100:.1f}%")
+                if DEBUG_ENABLED:
+                    logger.debug(f"📊 {pair} Orderbook calc: Bid={bid_volume:.2f}, Ask={ask_volume:.2f}, Total={total_volume:.2f}, Imbalance={imbalance_ratio*100:.1f}%")
                 
                 # Log order book analysis (every 30 seconds)
                 if current_time - self.last_analysis_log_time >= self.market_log_interval:
-                    cooldown_remaining = max(0, cooldown_period - (current_time - self.orderbook_v2_last_trade_time.get(pair, 0)))
+                    cooldown_remaining = max(0, cooldown_period - (current_time - self.orderbook_v2_last_trade_time.get(pair, float('-inf'))))
+                    data = {
+                        'pair': pair,
+                        'bid_volume': bid_volume,
+                        'ask_volume': ask_volume,
+                        'imbalance_ratio': imbalance_ratio,
+                        'best_bid': float(bids_arr[0, 0]),
+                        'best_ask': float(asks_arr[0, 0]),
+                        'cooldown_remaining': cooldown_remaining
+                    }
                     await self.log(
                         'market_data',
-                        f"📊 {pair} Order Book V2 | Bid: {bid_volume:.2f} ({imbalance_ratio*100:.1f}%) | Ask: {ask_volume:.2f} ({(1-imbalance_ratio)*100:.1f}%) | Threshold: {imbalance_threshold*100:.0f}% | Cooldown: {int(cooldown_remaining)}s",
-                        {
-                            'pair': pair,
-                            'bid_volume': bid_volume,
-                            'ask_volume': ask_volume,
-                            'imbalance_ratio': imbalance_ratio,
-                            'best_bid': float(bids[0][0]),
-                            'best_ask': float(asks[0][0]),
-                            'cooldown_remaining': cooldown_remaining
-                        }
+                        "📊 {pair} Order Book V2 | Bid: {bid_volume:.2f} ({bid_pct:.1f}%) | Ask: {ask_volume:.2f} ({ask_pct:.1f}%) | Threshold: {threshold_pct:.0f}% | Cooldown: {cooldown_s}s",
+                        data,
+                        fmt=dict(data, bid_pct=imbalance_ratio * 100, ask_pct=(1 - imbalance_ratio) * 100,
+                                 threshold_pct=imbalance_threshold * 100, cooldown_s=int(cooldown_remaining))
                     )
                     self.last_analysis_log_time = current_time
                 
                 # Exit logic for open positions (check FIRST, even during cooldown)
                 if has_open_position:
-                    position = next((p for p in self.positions if p['symbol'] == pair), None)
+                    position = self.positions_by_symbol.get(pair)
                     if position:
                         position_open_time = self.orderbook_v2_position_open_time.get(pair, current_time)
                         time_in_position = current_time - position_open_time
@@ -489,18 +1523,20 @@ class BotInstance:
                     continue
                 
                 # Check cooldown period (only for entries, not exits)
-                last_trade_time = self.orderbook_v2_last_trade_time.get(pair, 0)
+                last_trade_time = self.orderbook_v2_last_trade_time.get(pair, float('-inf'))
                 cooldown_remaining = cooldown_period - (current_time - last_trade_time)
                 
                 if cooldown_remaining > 0:
-                    logger.debug(f"⏸️ {pair} In cooldown: {int(cooldown_remaining)}s remaining | Imbalance: {imbalance_ratio*100:.1f}%")
+                    if DEBUG_ENABLED:
+                        logger.debug(f"⏸️ {pair} In cooldown: {int(cooldown_remaining)}s remaining | Imbalance: {imbalance_ratio*100:.1f}%")
                     continue
                 
                 # Entry signal - Long when bid volume > threshold (matches tkinter app exactly)
                 if imbalance_ratio > imbalance_threshold:
                     current_price = self.last_prices.get(pair)
                     if not current_price:
-                        logger.debug(f"⚠️ {pair} No price data available")
+                        if DEBUG_ENABLED:
+                            logger.debug(f"⚠️ {pair} No price data available")
                         continue
                     
                     logger.info(f"✅ {pair} ENTRY SIGNAL: Imbalance {imbalance_ratio*100:.1f}% > {imbalance_threshold*100:.0f}% threshold")
@@ -512,7 +1548,8 @@ class BotInstance:
                     else:
                         logger.warning(f"⚠️ {pair} Entry signal triggered but position open failed")
                 else:
-                    logger.debug(f"📊 {pair} Imbalance {imbalance_ratio*100:.1f}% below threshold {imbalance_threshold*100:.0f}%")
+                    if DEBUG_ENABLED:
+                        logger.debug(f"📊 {pair} Imbalance {imbalance_ratio*100:.1f}% below threshold {imbalance_threshold*100:.0f}%")
                     
             except Exception as e:
                 logger.error(f"Error in orderbook imbalance v2 for {pair}: {e}", exc_info=True)
@@ -520,14 +1557,15 @@ class BotInstance:
     
     async def run_multi_timeframe_breakout_strategy(self):
         """Multi-Timeframe Breakout Strategy - Advanced breakout detection"""
-        logger.info(f"🎯 Running Multi-Timeframe Breakout | Positions: {len(self.positions)}/{self.strategy['max_positions']} | Pairs: {self.strategy['pairs']}")
+        if DEBUG_ENABLED:
+            logger.debug(f"🎯 Running Multi-Timeframe Breakout | Positions: {len(self.positions)}/{self.strategy['max_positions']} | Pairs: {self.strategy['pairs']}")
         
         # Check if max positions reached (but still process pairs for market metrics)
         max_positions_reached = len(self.positions) >= self.strategy['max_positions']
         
         for pair in self.strategy['pairs']:
             # Check if already have position (skip trading, but still log market data)
-            has_open_position = any(p['symbol'] == pair for p in self.positions)
+            has_open_position = pair in self.positions_by_symbol
             
             try:
                 # Get current price
@@ -542,51 +1580,46 @@ class BotInstance:
                 highs = {}
                 lows = {}
                 volumes = {}
+                last_closed_1h_oc = None  # (open, close) of last closed 1h candle - reused for trend checks
+                
+                # Get candles for every timeframe concurrently - last 20 candles of each interval
+                # (15m = 5 hours, 30m = 10 hours, 1h = 20 hours)
+                end_time = self.now_ms
+                tf_minutes = {'15m': 15, '30m': 30, '1h': 60}
+                fetched = await asyncio.gather(
+                    *(self.get_candles_cached(pair, tf, end_time - 20 * tf_minutes[tf] * 60 * 1000, end_time) for tf in timeframes),
+                    return_exceptions=True
+                )
                 
-                for tf in timeframes:
+                for tf, candles in zip(timeframes, fetched):
                     try:
-                        # Get candles for timeframe - use proper interval
-                        end_time = int(datetime.now().timestamp() * 1000)
-                        if tf == '15m':
-                            # For 15m: get last 20 candles (300 minutes = 5 hours)
-                            start_time = end_time - (20 * 15 * 60 * 1000)
-                            interval = '15m'
-                        elif tf == '30m':
-                            # For 30m: get last 20 candles (600 minutes = 10 hours)
-                            start_time = end_time - (20 * 30 * 60 * 1000)
-                            interval = '30m'
-                        else:  # 1h
-                            # For 1h: get last 20 candles (1200 minutes = 20 hours)
-                            start_time = end_time - (20 * 60 * 60 * 1000)
-                            interval = '1h'
+                        if isinstance(candles, Exception):
+                            raise candles
                         
-                        candles = await self.get_candles_cached(pair, interval, start_time, end_time)
-                        
-                        if candles and len(candles) > 0:
+                        if candles is not None and len(candles['t']) > 0:
                             # CRITICAL: Use only the PREVIOUS closed candle (exclude the current incomplete candle)
                             # The last candle in the array is the current incomplete one, so we use the second-to-last
-                            closed_candles = candles[:-1] if len(candles) > 1 else candles
+                            closed = slice(None, -1) if len(candles['t']) > 1 else slice(None)
+                            closed_h = candles['h'][closed]
+                            closed_l = candles['l'][closed]
+                            closed_v = candles['v'][closed]
                             
-                            if len(closed_candles) > 0:
-                                # Use the PREVIOUS closed candle's high/low (most recent completed candle)
-                                last_closed_candle = closed_candles[-1]
-                                tf_high = float(last_closed_candle['h'])
-                                tf_low = float(last_closed_candle['l'])
-                                
-                                # Average volume from closed candles
-                                tf_volume = sum(float(c['v']) for c in closed_candles) / len(closed_candles)
-                                
-                                highs[tf] = tf_high
-                                lows[tf] = tf_low
-                                volumes[tf] = tf_volume
-                                
+                            # Use the PREVIOUS closed candle's high/low (most recent completed candle)
+                            tf_high = float(closed_h[-1])
+                            tf_low = float(closed_l[-1])
+                            
+                            # Average volume from closed candles
+                            tf_volume = float(closed_v.mean())
+                            
+                            highs[tf] = tf_high
+                            lows[tf] = tf_low
+                            volumes[tf] = tf_volume
+                            
+                            if tf == '1h' and len(candles['t']) > 1:
+                                last_closed_1h_oc = (float(candles['o'][-2]), float(candles['c'][-2]))
+                            
+                            if DEBUG_ENABLED:
                                 logger.debug(f"{pair} {tf}: Previous candle H={tf_high:.2f} L={tf_low:.2f}")
-                            else:
-                                # No closed candles yet - use current price as fallback
-                                logger.warning(f"No closed candles for {pair} {tf}, using current price")
-                                highs[tf] = current_price
-                                lows[tf] = current_price
-                                volumes[tf] = 0
                         else:
                             # No candles yet - skip this pair
                             logger.warning(f"No candle data for {pair} {tf}")
@@ -600,30 +1633,21 @@ class BotInstance:
                         lows[tf] = current_price
                         volumes[tf] = 0
                 
+                # Trend from the last closed 1h candle (already fetched above with the 1h levels)
+                trend_direction = "Neutral"
+                if last_closed_1h_oc is not None:
+                    candle_open, candle_close = last_closed_1h_oc
+                    if candle_close > candle_open:
+                        trend_direction = "Bullish"
+                    elif candle_close < candle_open:
+                        trend_direction = "Bearish"
+                
                 # DOWNTREND FILTER: Check if last closed 1h candle is bearish
                 # Skip trading during downtrends to avoid catching falling knives
-                is_downtrend = False
-                try:
-                    if '1h' in highs and '1h' in lows:
-                        # Get the last closed 1h candle to check trend
-                        end_time_1h = int(datetime.now().timestamp() * 1000)
-                        start_time_1h = end_time_1h - (2 * 60 * 60 * 1000)  # Last 2 hours (2 candles)
-                        candles_1h = await self.get_candles_cached(pair, '1h', start_time_1h, end_time_1h)
-                        
-                        if candles_1h and len(candles_1h) > 1:
-                            # Get the last CLOSED 1h candle (second-to-last in array)
-                            last_closed_1h = candles_1h[-2] if len(candles_1h) > 1 else candles_1h[-1]
-                            candle_close = float(last_closed_1h['c'])
-                            candle_open = float(last_closed_1h['o'])
-                            
-                            # If close < open, it's a bearish candle (downtrend)
-                            if candle_close < candle_open:
-                                is_downtrend = True
-                                logger.debug(f"📉 {pair} Downtrend detected: Last 1h candle bearish (O: ${candle_open:.2f} C: ${candle_close:.2f})")
-                except Exception as e:
-                    logger.warning(f"Failed to check downtrend for {pair}: {e}")
-                    # If we can't check, allow trading (fail-safe)
-                    is_downtrend = False
+                is_downtrend = trend_direction == "Bearish"
+                if is_downtrend:
+                    if DEBUG_ENABLED:
+                        logger.debug(f"📉 {pair} Downtrend detected: Last 1h candle bearish (O: ${last_closed_1h_oc[0]:.2f} C: ${last_closed_1h_oc[1]:.2f})")
                 
                 # Calculate momentum score
                 momentum_score = await self.calculate_momentum_score(pair, current_price)
@@ -636,16 +1660,7 @@ class BotInstance:
                 # DIP-BUYING STRATEGY: Very tight wiggle for precise support entries
                 # Only buy when price is very close to the low (within a few cents max)
                 wiggle_low = 0.0005  # 0.05% - very tight for precise dip entries (~$0.08 at $168)
-                wiggle_high = 0.005  # 0.5% - not used (highs disabled), but kept for consistency
-                
-                # Near highs? (price within 0.7% of high - only strong breakouts)
-                # Use .get() to safely access dict values
-                high_1h_val = highs.get('1h', 0)
-                high_30m_val = highs.get('30m', 0)
-                high_15m_val = highs.get('15m', 0)
-                near_high_1h = abs(current_price - high_1h_val) / high_1h_val <= wiggle_high if high_1h_val > 0 else False
-                near_high_30m = abs(current_price - high_30m_val) / high_30m_val <= wiggle_high if high_30m_val > 0 else False
-                near_high_15m = abs(current_price - high_15m_val) / high_15m_val <= wiggle_high if high_15m_val > 0 else False
+                # (Near-high checks removed - highs are disabled, dip-buying only)
                 
                 # Near lows? Only buy when price is AT or BELOW the low (testing support from above)
                 # Don't buy when price is ABOVE the low (that means it already broke and is now resistance)
@@ -653,9 +1668,12 @@ class BotInstance:
                 low_30m_val = lows.get('30m', 0)
                 low_15m_val = lows.get('15m', 0)
                 # Price must be <= low (or very close below it) to test support, not above it
-                near_low_1h = (current_price <= low_1h_val and abs(current_price - low_1h_val) / low_1h_val <= wiggle_low) if low_1h_val > 0 else False
-                near_low_30m = (current_price <= low_30m_val and abs(current_price - low_30m_val) / low_30m_val <= wiggle_low) if low_30m_val > 0 else False
-                near_low_15m = (current_price <= low_15m_val and abs(current_price - low_15m_val) / low_15m_val <= wiggle_low) if low_15m_val > 0 else False
+                # One vector op over [1h, 30m, 15m]; missing lows (0) divide by inf and never match
+                low_vals = np.array([low_1h_val, low_30m_val, low_15m_val], dtype=np.float64)
+                near_lows = (low_vals > 0) & (current_price <= low_vals) & \
+                    (np.abs(current_price - low_vals) / np.where(low_vals > 0, low_vals, np.inf) <= wiggle_low)
+                near_low_1h, near_low_30m, near_low_15m = near_lows.tolist()  # Plain bools (JSON-safe for log data)
+                high_vals = np.array([highs.get('1h', 0), highs.get('30m', 0), highs.get('15m', 0)], dtype=np.float64)  # Same order, for the log distances
                 
                 # REQUIRE volume for ALL entries (no exceptions - volume confirms the move)
                 has_volume = volume_weight > 0.5
@@ -663,54 +1681,27 @@ class BotInstance:
                 # ALWAYS log market metrics (every 30 seconds) - persists and updates automatically
                 # This logs even when we have an open position so we can monitor levels
                 # Use separate timer to ensure market metrics don't conflict with other logs
-                current_time = datetime.now().timestamp()
-                last_metrics_time = getattr(self, 'last_market_metrics_log_time', 0)
-                # Log immediately on first run (last_metrics_time == 0) or every 30 seconds
-                should_log_metrics = (last_metrics_time == 0) or (current_time - last_metrics_time >= self.market_log_interval)
+                current_time = self.now_mono
+                last_metrics_time = self.last_market_metrics_log_time
+                # Log immediately on first run (timer starts at -inf) or every 30 seconds
+                should_log_metrics = current_time - last_metrics_time >= self.market_log_interval
                 
                 # Always log market metrics - this is critical for monitoring
                 if should_log_metrics:
                     try:
-                        # Calculate how close we are to triggers for ALL timeframes
-                        # Handle division by zero safely
-                        high_1h_val_safe = highs.get('1h', current_price) if highs.get('1h', 0) > 0 else current_price
-                        low_1h_val_safe = lows.get('1h', current_price) if lows.get('1h', 0) > 0 else current_price
-                        high_30m_val_safe = highs.get('30m', current_price) if highs.get('30m', 0) > 0 else current_price
-                        low_30m_val_safe = lows.get('30m', current_price) if lows.get('30m', 0) > 0 else current_price
-                        high_15m_val_safe = highs.get('15m', current_price) if highs.get('15m', 0) > 0 else current_price
-                        low_15m_val_safe = lows.get('15m', current_price) if lows.get('15m', 0) > 0 else current_price
-                        
-                        high_1h_distance = ((current_price / high_1h_val_safe) - 1) * 100 if high_1h_val_safe > 0 else 0
-                        low_1h_distance = ((low_1h_val_safe / current_price) - 1) * 100 if current_price > 0 else 0
-                        high_30m_distance = ((current_price / high_30m_val_safe) - 1) * 100 if high_30m_val_safe > 0 else 0
-                        low_30m_distance = ((low_30m_val_safe / current_price) - 1) * 100 if current_price > 0 else 0
-                        high_15m_distance = ((current_price / high_15m_val_safe) - 1) * 100 if high_15m_val_safe > 0 else 0
-                        low_15m_distance = ((low_15m_val_safe / current_price) - 1) * 100 if current_price > 0 else 0
-                        
-                        # Determine trend direction from last closed 1h candle
-                        trend_direction = "Neutral"
-                        try:
-                            if '1h' in highs and '1h' in lows:
-                                end_time_1h = int(datetime.now().timestamp() * 1000)
-                                start_time_1h = end_time_1h - (2 * 60 * 60 * 1000)
-                                candles_1h = await self.get_candles_cached(pair, '1h', start_time_1h, end_time_1h)
-                                
-                                if candles_1h and len(candles_1h) > 1:
-                                    last_closed_1h = candles_1h[-2] if len(candles_1h) > 1 else candles_1h[-1]
-                                    candle_close = float(last_closed_1h['c'])
-                                    candle_open = float(last_closed_1h['o'])
-                                    
-                                    if candle_close > candle_open:
-                                        trend_direction = "Bullish"
-                                    elif candle_close < candle_open:
-                                        trend_direction = "Bearish"
-                                    else:
-                                        trend_direction = "Neutral"
-                        except Exception as e:
-                            logger.debug(f"Failed to determine trend for {pair}: {e}")
+                        # Calculate how close we are to triggers for ALL timeframes, as one vector op
+                        # over [1h, 30m, 15m]; missing levels count as 0% away
+                        with np.errstate(divide='ignore', invalid='ignore'):
+                            high_dists = np.where(high_vals > 0, (current_price / high_vals - 1) * 100, 0.0)
+                            low_dists = np.where(low_vals > 0, (low_vals / current_price - 1) * 100, 0.0) if current_price > 0 else np.zeros(3)
+                        high_1h_distance, high_30m_distance, high_15m_distance = high_dists.tolist()
+                        low_1h_distance, low_30m_distance, low_15m_distance = low_dists.tolist()
                         
                         # Format market metrics message with all timeframe data
-                        message = f"📊 {pair} | ${current_price:.2f} | 1h: ${highs.get('1h', 0):.2f}/${lows.get('1h', 0):.2f} ({high_1h_distance:+.3f}%/{low_1h_distance:+.3f}%) | 30m: ${highs.get('30m', 0):.2f}/${lows.get('30m', 0):.2f} ({high_30m_distance:+.3f}%/{low_30m_distance:+.3f}%) | 15m: ${highs.get('15m', 0):.2f}/${lows.get('15m', 0):.2f} ({high_15m_distance:+.3f}%/{low_15m_distance:+.3f}%) | Vol: {volume_weight:.2f}x | Trend: {trend_direction}"
+                        message = self.METRICS_TEMPLATE.format_map(dict(
+                            self.level_fields(high_vals, low_vals, high_dists, low_dists),
+                            pair=pair, price=current_price, volume_weight=volume_weight, trend=trend_direction
+                        ))
                         data = {
                         'pair': pair,
                         'current_price': current_price,
@@ -749,47 +1740,25 @@ class BotInstance:
                 
                 # Update monitoring log when no position is open (every 5 seconds)
                 if not has_open_position:
-                    current_time_monitor = datetime.now().timestamp()
-                    last_monitor_update = self.last_position_update_time.get(pair, 0)
+                    current_time_monitor = self.now_mono
+                    last_monitor_update = self.last_position_update_time.get(pair, float('-inf'))
                     
                     if current_time_monitor - last_monitor_update >= 5:  # Update every 5 seconds
-                        # Calculate distances to entry levels (1h/30m/15m only)
-                        high_1h_dist = ((highs.get('1h', 0) - current_price) / current_price * 100) if highs.get('1h', 0) > 0 else 0
-                        low_1h_dist = ((current_price - lows.get('1h', 0)) / current_price * 100) if lows.get('1h', 0) > 0 else 0
-                        high_30m_dist = ((highs.get('30m', 0) - current_price) / current_price * 100) if highs.get('30m', 0) > 0 else 0
-                        low_30m_dist = ((current_price - lows.get('30m', 0)) / current_price * 100) if lows.get('30m', 0) > 0 else 0
-                        high_15m_dist = ((highs.get('15m', 0) - current_price) / current_price * 100) if highs.get('15m', 0) > 0 else 0
-                        low_15m_dist = ((current_price - lows.get('15m', 0)) / current_price * 100) if lows.get('15m', 0) > 0 else 0
-                        
                         # Determine nearest entry level (LOWS ONLY - no high breakouts)
                         nearest_level = "Monitoring for dip-buy opportunities..."
                         if near_low_1h or near_low_30m or near_low_15m:
                             nearest_level = "Near LOW (Support) - Potential LONG entry"
                         # High breakouts disabled - too high risk
                         
-                        # Determine trend direction from last closed 1h candle
-                        trend_direction = "Neutral"
-                        try:
-                            if '1h' in highs and '1h' in lows:
-                                end_time_1h = int(datetime.now().timestamp() * 1000)
-                                start_time_1h = end_time_1h - (2 * 60 * 60 * 1000)
-                                candles_1h = await self.get_candles_cached(pair, '1h', start_time_1h, end_time_1h)
-                                
-                                if candles_1h and len(candles_1h) > 1:
-                                    last_closed_1h = candles_1h[-2] if len(candles_1h) > 1 else candles_1h[-1]
-                                    candle_close = float(last_closed_1h['c'])
-                                    candle_open = float(last_closed_1h['o'])
-                                    
-                                    if candle_close > candle_open:
-                                        trend_direction = "Bullish"
-                                    elif candle_close < candle_open:
-                                        trend_direction = "Bearish"
-                                    else:
-                                        trend_direction = "Neutral"
-                        except Exception as e:
-                            logger.debug(f"Failed to determine trend for {pair}: {e}")
+                        # Distances to entry levels over [1h, 30m, 15m]
+                        high_dists = np.where(high_vals > 0, (high_vals - current_price) / current_price * 100, 0.0)
+                        low_dists = np.where(low_vals > 0, (current_price - low_vals) / current_price * 100, 0.0)
                         
-                        message = f"👁️ Monitoring {pair} | Price: ${current_price:.2f} | {nearest_level} | 1h: ${highs.get('1h', 0):.2f}/${lows.get('1h', 0):.2f} ({high_1h_dist:+.2f}%/{low_1h_dist:+.2f}%) | 30m: ${highs.get('30m', 0):.2f}/${lows.get('30m', 0):.2f} ({high_30m_dist:+.2f}%/{low_30m_dist:+.2f}%) | 15m: ${highs.get('15m', 0):.2f}/${lows.get('15m', 0):.2f} ({high_15m_dist:+.2f}%/{low_15m_dist:+.2f}%) | Vol: {volume_weight:.2f}x | Trend: {trend_direction}"
+                        message = self.MONITOR_TEMPLATE.format_map(dict(
+                            self.level_fields(high_vals, low_vals, high_dists, low_dists),
+                            pair=pair, price=current_price, nearest_level=nearest_level,
+                            volume_weight=volume_weight, trend=trend_direction
+                        ))
                         data = {
                             'pair': pair,
                             'current_price': current_price,
@@ -808,7 +1777,8 @@ class BotInstance:
                 
                 # Skip trading if in downtrend (after logging market metrics)
                 if is_downtrend:
-                    logger.debug(f"⏸️ {pair} Skipping trade - Market in downtrend")
+                    if DEBUG_ENABLED:
+                        logger.debug(f"⏸️ {pair} Skipping trade - Market in downtrend")
                     continue  # Skip trading logic, but market metrics already logged above
                 
                 # Only check for new trades if we don't already have a position AND haven't reached max positions
@@ -816,26 +1786,29 @@ class BotInstance:
                     continue  # Skip trading logic, but we've already logged market data above
                 
                 # Check cooldown period - don't open new position immediately after closing
-                current_time = datetime.now().timestamp()
-                last_close_time = self.last_position_close_time.get(pair, 0)
+                current_time = self.now_mono
+                last_close_time = self.last_position_close_time.get(pair, float('-inf'))
                 if current_time - last_close_time < self.position_cooldown:
                     remaining_cooldown = int(self.position_cooldown - (current_time - last_close_time))
-                    logger.debug(f"⏸️ {pair} in cooldown ({remaining_cooldown}s remaining) - skipping trade check")
+                    if DEBUG_ENABLED:
+                        logger.debug(f"⏸️ {pair} in cooldown ({remaining_cooldown}s remaining) - skipping trade check")
                     continue
                 
                 # SIMPLE LOGIC - Near high/low + volume = TRADE
                 reason = ""
                 
                 # Debug: Log all conditions for trade decision with distances (LOWS ONLY - no high breakouts)
-                dist_to_low_1h = ((current_price - low_1h_val) / low_1h_val * 100) if low_1h_val > 0 else 999
-                dist_to_low_30m = ((current_price - low_30m_val) / low_30m_val * 100) if low_30m_val > 0 else 999
-                dist_to_low_15m = ((current_price - low_15m_val) / low_15m_val * 100) if low_15m_val > 0 else 999
-                
-                logger.info(f"🔍 {pair} DIP-BUY CHECK | Price: ${current_price:.2f} | "
-                          f"1h Low: Near={near_low_1h} (L=${low_1h_val:.2f} | Dist: {dist_to_low_1h:+.2f}%) | "
-                          f"30m Low: Near={near_low_30m} (L=${low_30m_val:.2f} | Dist: {dist_to_low_30m:+.2f}%) | "
-                          f"15m Low: Near={near_low_15m} (L=${low_15m_val:.2f} | Dist: {dist_to_low_15m:+.2f}%) | "
-                          f"Vol: {volume_weight:.2f}x | HasVol: {has_volume}")
+                # Only on the market metrics window - building this line every tick is wasted work
+                if should_log_metrics:
+                    dist_to_low_1h = ((current_price - low_1h_val) / low_1h_val * 100) if low_1h_val > 0 else 999
+                    dist_to_low_30m = ((current_price - low_30m_val) / low_30m_val * 100) if low_30m_val > 0 else 999
+                    dist_to_low_15m = ((current_price - low_15m_val) / low_15m_val * 100) if low_15m_val > 0 else 999
+                    
+                    logger.info(f"🔍 {pair} DIP-BUY CHECK | Price: ${current_price:.2f} | "
+                              f"1h Low: Near={near_low_1h} (L=${low_1h_val:.2f} | Dist: {dist_to_low_1h:+.2f}%) | "
+                              f"30m Low: Near={near_low_30m} (L=${low_30m_val:.2f} | Dist: {dist_to_low_30m:+.2f}%) | "
+                              f"15m Low: Near={near_low_15m} (L=${low_15m_val:.2f} | Dist: {dist_to_low_15m:+.2f}%) | "
+                              f"Vol: {volume_weight:.2f}x | HasVol: {has_volume}")
                 
                 # STRICT DIP-BUYING STRATEGY: ONLY trade lows (support levels)
                 # NO high breakouts - too high risk
@@ -869,33 +1842,38 @@ class BotInstance:
                 logger.error(f"❌ Error in multi-timeframe analysis for {pair}: {e}", exc_info=True)
                 await self.log('error', f"❌ Error analyzing {pair}: {str(e)}", {'error': str(e), 'error_type': type(e).__name__})
     
+    @staticmethod
+    def level_fields(highs: np.ndarray, lows: np.ndarray, high_dists: np.ndarray, low_dists: np.ndarray) -> dict:
+        """Template fields (high_1h, low_1h_dist, ...) from [1h, 30m, 15m] level and distance arrays"""
+        fields = {}
+        for tf, high, low, high_dist, low_dist in zip(('1h', '30m', '15m'), highs.tolist(), lows.tolist(),
+                                                      high_dists.tolist(), low_dists.tolist()):
+            fields[f'high_{tf}'] = high
+            fields[f'low_{tf}'] = low
+            fields[f'high_{tf}_dist'] = high_dist
+            fields[f'low_{tf}_dist'] = low_dist
+        return fields
+    
     async def calculate_momentum_score(self, pair: str, current_price: float) -> float:
         """Calculate momentum score for multi-timeframe strategy"""
         try:
             # Get recent 1-minute candles for momentum calculation
-            end_time = int(datetime.now().timestamp() * 1000)
+            end_time = self.now_ms
             start_time = end_time - (10 * 60 * 1000)  # Last 10 minutes
             
             candles = await self.get_candles_cached(pair, '1m', start_time, end_time)
             
-            if not candles or len(candles) < 5:
-                return 0
-            
-            # Calculate price momentum
-            recent_prices = [float(c['c']) for c in candles[-5:]]  # Last 5 minutes
-            older_prices = [float(c['c']) for c in candles[-10:-5]]  # 5-10 minutes ago
-            
-            if not older_prices:
+            if candles is None or len(candles['c']) < 5:
                 return 0
             
-            recent_avg = sum(recent_prices) / len(recent_prices)
-            older_avg = sum(older_prices) / len(older_prices)
+            # Last 10 closes: last 5 minutes vs 5-10 minutes ago
+            closes = candles['c'][-10:]
+            if len(closes) < 6:
+                return 0  # No older prices to compare against
             
-            momentum = ((recent_avg - older_avg) / older_avg) * 100
+            momentum, volatility = momentum_kernel(closes)
             
             # Apply volatility bonus
-            price_changes = [abs(recent_prices[i] - recent_prices[i-1]) / recent_prices[i-1] for i in range(1, len(recent_prices))]
-            volatility = sum(price_changes) / len(price_changes) if price_changes else 0
             volatility_bonus = min(volatility * 10, 2)  # Cap at 2x bonus
             
             return momentum * (1 + volatility_bonus)
@@ -927,44 +1905,44 @@ class BotInstance:
             await self.log('info', f"⚠️ Max positions reached ({self.strategy['max_positions']})", {})
             return
         
-        for pair in self.strategy['pairs']:
-            if any(p['symbol'] == pair for p in self.positions):
-                continue
-            
-            if pair not in self.last_prices:
-                continue
-            
+        pairs = [pair for pair in self.strategy['pairs'] if pair not in self.positions_by_symbol and pair in self.last_prices]
+        
+        # Get recent candles for every pair concurrently; signals and entries below stay sequential
+        end_time = self.now_ms
+        start_time = end_time - 300 * 1000
+        fetched = await asyncio.gather(
+            *(self.get_candles_cached(pair, '1m', start_time, end_time) for pair in pairs),
+            return_exceptions=True
+        )
+        
+        for pair, candles in zip(pairs, fetched):
+            if pair in self.positions_by_symbol:
+                continue  # Opened earlier in this loop (pair listed twice)
             current_price = self.last_prices[pair]
             
-            # Get recent candles
             try:
-                end_time = int(datetime.now().timestamp() * 1000)
-                start_time = int((datetime.now().timestamp() - 300) * 1000)
-                candles = await self.get_candles_cached(pair, '1m', start_time, end_time)
+                if isinstance(candles, Exception):
+                    raise candles
                 
-                if not candles or len(candles) < 5:
+                if candles is None or len(candles['c']) < 5:
                     continue
                 
-                # Calculate momentum
-                old_price = float(candles[0]['c'])
-                momentum = ((current_price - old_price) / old_price) * 100
+                # Calculate momentum (+1/-1 signal past ±2%)
+                momentum, signal = breakout_signal(candles['c'], current_price, 2.0)
                 
                 # Log momentum (only every 30 seconds to avoid spam)
-                current_time = datetime.now().timestamp()
+                current_time = self.now_mono
                 if current_time - self.last_analysis_log_time >= self.market_log_interval:
-                    await self.log(
-                        'market_data',
-                        f"📈 {pair} Momentum: {momentum:+.2f}% | Current: ${current_price:.2f}",
-                        {'pair': pair, 'momentum': momentum, 'price': current_price}
-                    )
+                    data = {'pair': pair, 'momentum': momentum, 'price': current_price}
+                    await self.log('market_data', "📈 {pair} Momentum: {momentum:+.2f}% | Current: ${price:.2f}", data, fmt=data)
                     self.last_analysis_log_time = current_time
                 
                 # Entry signals
-                if momentum > 2.0:
+                if signal > 0:
                     success = await self.open_position(pair, 'long', current_price)
                     if success:
                         await self.log('signal', f"🚀 LONG BREAKOUT: {pair} ({momentum:+.2f}%)", {})
-                elif momentum < -2.0:
+                elif signal < 0:
                     success = await self.open_position(pair, 'short', current_price)
                     if success:
                         await self.log('signal', f"📉 SHORT BREAKOUT: {pair} ({momentum:.2f}%)", {})
@@ -975,13 +1953,14 @@ class BotInstance:
     async def run_liquidity_grab_strategy(self):
         """Liquidity Grab Strategy - Buy when price wicks below support then bounces back"""
         # Throttle: Don't run every second - check every 5 seconds to reduce API calls
-        current_time = datetime.now().timestamp()
+        current_time = self.now_mono
         if current_time - self.last_liquidity_grab_check < self.liquidity_grab_check_interval:
             return  # Skip this tick, wait for next interval
         
         self.last_liquidity_grab_check = current_time
         
-        logger.info(f"🎯 Running Liquidity Grab Strategy | Positions: {len(self.positions)}/{self.strategy['max_positions']} | Pairs: {self.strategy['pairs']}")
+        if DEBUG_ENABLED:
+            logger.debug(f"🎯 Running Liquidity Grab Strategy | Positions: {len(self.positions)}/{self.strategy['max_positions']} | Pairs: {self.strategy['pairs']}")
         
         # Check if max positions reached
         max_positions_reached = len(self.positions) >= self.strategy['max_positions']
@@ -990,7 +1969,7 @@ class BotInstance:
         
         for pair in self.strategy['pairs']:
             # Skip if already have position
-            has_open_position = any(p['symbol'] == pair for p in self.positions)
+            has_open_position = pair in self.positions_by_symbol
             if has_open_position:
                 continue
             
@@ -999,25 +1978,20 @@ class BotInstance:
                 if pair not in self.last_prices:
                     continue
                 current_price = self.last_prices[pair]
-                current_time = datetime.now().timestamp()
+                current_time = self.now_mono
                 
                 # Fetch 1h and 30m candles to get support levels
-                end_time = int(datetime.now().timestamp() * 1000)
+                end_time = self.now_ms
                 start_time_1h = end_time - (2 * 60 * 60 * 1000)  # Last 2 hours
                 start_time_30m = end_time - (2 * 30 * 60 * 1000)  # Last 1 hour
                 
                 # Get 1h support level (last closed candle low)
                 try:
                     candles_1h = await self.get_candles_cached(pair, '1h', start_time_1h, end_time)
-                    if candles_1h and len(candles_1h) > 1:
-                        closed_1h = candles_1h[:-1] if len(candles_1h) > 1 else candles_1h
-                        if len(closed_1h) > 0:
-                            last_closed_1h = closed_1h[-1]
-                            support_1h = float(last_closed_1h['l'])
-                            avg_volume_1h = sum(float(c['v']) for c in closed_1h) / len(closed_1h) if len(closed_1h) > 0 else 0
-                        else:
-                            support_1h = None
-                            avg_volume_1h = 0
+                    if candles_1h is not None and len(candles_1h['t']) > 1:
+                        # Exclude the current incomplete candle
+                        support_1h = float(candles_1h['l'][-2])
+                        avg_volume_1h = float(candles_1h['v'][:-1].mean())
                     else:
                         support_1h = None
                         avg_volume_1h = 0
@@ -1029,15 +2003,10 @@ class BotInstance:
                 # Get 30m support level (last closed candle low)
                 try:
                     candles_30m = await self.get_candles_cached(pair, '30m', start_time_30m, end_time)
-                    if candles_30m and len(candles_30m) > 1:
-                        closed_30m = candles_30m[:-1] if len(candles_30m) > 1 else candles_30m
-                        if len(closed_30m) > 0:
-                            last_closed_30m = closed_30m[-1]
-                            support_30m = float(last_closed_30m['l'])
-                            avg_volume_30m = sum(float(c['v']) for c in closed_30m) / len(closed_30m) if len(closed_30m) > 0 else 0
-                        else:
-                            support_30m = None
-                            avg_volume_30m = 0
+                    if candles_30m is not None and len(candles_30m['t']) > 1:
+                        # Exclude the current incomplete candle
+                        support_30m = float(candles_30m['l'][-2])
+                        avg_volume_30m = float(candles_30m['v'][:-1].mean())
                     else:
                         support_30m = None
                         avg_volume_30m = 0
@@ -1049,13 +2018,13 @@ class BotInstance:
                 # Check downtrend filter (skip if bearish 30m candle)
                 is_downtrend = False
                 try:
-                    if candles_30m and len(candles_30m) > 1:
-                        last_closed_30m_check = candles_30m[-2] if len(candles_30m) > 1 else candles_30m[-1]
-                        candle_close = float(last_closed_30m_check['c'])
-                        candle_open = float(last_closed_30m_check['o'])
+                    if candles_30m is not None and len(candles_30m['t']) > 1:
+                        candle_close = float(candles_30m['c'][-2])
+                        candle_open = float(candles_30m['o'][-2])
                         if candle_close < candle_open:
                             is_downtrend = True
-                            logger.debug(f"📉 {pair} Downtrend detected: Last 30m candle bearish (O: ${candle_open:.2f} C: ${candle_close:.2f})")
+                            if DEBUG_ENABLED:
+                                logger.debug(f"📉 {pair} Downtrend detected: Last 30m candle bearish (O: ${candle_open:.2f} C: ${candle_close:.2f})")
                 except Exception as e:
                     logger.debug(f"Failed to check downtrend for {pair}: {e}")
                 
@@ -1074,8 +2043,8 @@ class BotInstance:
                 try:
                     start_time_15m = end_time - (15 * 60 * 1000)  # Last 15 minutes
                     candles_15m = await self.get_candles_cached(pair, '15m', start_time_15m, end_time)
-                    if candles_15m and len(candles_15m) > 0:
-                        current_volume = float(candles_15m[-1]['v']) if candles_15m else 0
+                    if candles_15m is not None and len(candles_15m['v']) > 0:
+                        current_volume = float(candles_15m['v'][-1])
                     else:
                         current_volume = 0
                 except Exception as e:
@@ -1157,7 +2126,8 @@ class BotInstance:
                     
                     # Log wick event status for debugging
                     if time_since_wick <= 30:  # Log every 30 seconds when monitoring a wick event
-                        logger.debug(f"🔍 {pair} Monitoring wick: Support ${support_level:.2f} ({support_tf}) | Current ${current_price:.2f} | Recovery: {price_recovery:+.2f}% | Time: {int(time_since_wick)}s")
+                        if DEBUG_ENABLED:
+                            logger.debug(f"🔍 {pair} Monitoring wick: Support ${support_level:.2f} ({support_tf}) | Current ${current_price:.2f} | Recovery: {price_recovery:+.2f}% | Time: {int(time_since_wick)}s")
                     
                     # Check if price recovered to near/above support
                     if price_near_support:
@@ -1184,7 +2154,8 @@ class BotInstance:
                                     logger.error(f"❌ Exception calling open_position for {pair}: {open_error}", exc_info=True)
                                     await self.log('error', f"❌ Exception opening position for {pair}: {str(open_error)}", {'error': str(open_error)})
                             else:
-                                logger.debug(f"📊 {pair} Recovered to support but volume low ({volume_ratio:.2f}x) and recovery weak ({price_recovery:+.2f}%)")
+                                if DEBUG_ENABLED:
+                                    logger.debug(f"📊 {pair} Recovered to support but volume low ({volume_ratio:.2f}x) and recovery weak ({price_recovery:+.2f}%)")
                         else:
                             # Timeout exceeded - cleanup
                             logger.debug(f"⏱️ {pair} Liquidity grab expired - no bounce within 10min")
@@ -1202,25 +2173,30 @@ class BotInstance:
     async def run_support_liquidity_strategy(self):
         """Support Liquidity Strategy - Buy at support levels when liquidity flow is positive"""
         # Throttle: Check every 5 seconds to reduce API calls
-        current_time = datetime.now().timestamp()
-        if not hasattr(self, 'last_support_liquidity_check'):
-            self.last_support_liquidity_check = 0
-        
+        current_time = self.now_mono
         if current_time - self.last_support_liquidity_check < 5:
             return  # Skip this tick, wait for next interval
         
         self.last_support_liquidity_check = current_time
         
-        logger.info(f"🎯 Running Support Liquidity Strategy | Positions: {len(self.positions)}/{self.strategy['max_positions']} | Pairs: {self.strategy['pairs']}")
+        if DEBUG_ENABLED:
+            logger.debug(f"🎯 Running Support Liquidity Strategy | Positions: {len(self.positions)}/{self.strategy['max_positions']} | Pairs: {self.strategy['pairs']}")
         
         # Check if max positions reached
         max_positions_reached = len(self.positions) >= self.strategy['max_positions']
         if max_positions_reached:
             return
         
+        # Scanner levels for every pair in one (shared, cached) query
+        try:
+            levels_by_symbol = await get_scanner_levels(self.strategy['pairs'])
+        except Exception as e:
+            logger.warning(f"❌ Failed to fetch scanner levels for {self.strategy['pairs']}: {e}")
+            levels_by_symbol = {}
+        
         for pair in self.strategy['pairs']:
             # Check if already have position (but still log market data)
-            has_open_position = any(p['symbol'] == pair for p in self.positions)
+            has_open_position = pair in self.positions_by_symbol
             
             # Get current price first (before try block so we can log even if other stuff fails)
             if pair not in self.last_prices:
@@ -1237,22 +2213,14 @@ class BotInstance:
             flow_ratio = 0.5
             
             try:
-                # 1. FETCH LEVELS FROM SCANNER_LEVELS TABLE
-                scanner_levels_data = None
-                try:
-                    result = supabase.table('scanner_levels')\
-                        .select('*')\
-                        .eq('symbol', pair)\
-                        .execute()
-                    
-                    if result.data and len(result.data) > 0:
-                        scanner_levels_data = result.data[0]
+                # 1. LEVELS FROM THE SCANNER_LEVELS TABLE (loaded for every pair above)
+                scanner_levels_data = levels_by_symbol.get(pair)
+                if scanner_levels_data:
+                    if DEBUG_ENABLED:
                         logger.debug(f"✅ Fetched scanner levels for {pair} from Supabase")
-                    else:
+                else:
+                    if DEBUG_ENABLED:
                         logger.debug(f"⚠️ No scanner levels data found for {pair} in Supabase")
-                except Exception as e:
-                    logger.warning(f"❌ Failed to fetch scanner levels for {pair}: {e}")
-                    scanner_levels_data = None
                 
                 # Parse levels data
                 
@@ -1298,76 +2266,29 @@ class BotInstance:
                 sell_volume = 0
                 
                 try:
-                    # Fetch recent trades using HTTP API (more reliable than SDK method)
+                    # Fetch recent trades (one shared snapshot per coin across bots)
                     try:
-                        response = requests.post(
-                            HYPERLIQUID_API_URL,
-                            headers={'Content-Type': 'application/json'},
-                            json={'type': 'recentTrades', 'coin': pair},
-                            timeout=5
-                        )
-                        
-                        if response.ok:
-                            recent_trades = response.json()
+                        recent_trades = await market_stream.fetch_trades(pair)
+                        if DEBUG_ENABLED:
                             logger.debug(f"✅ Fetched {len(recent_trades) if isinstance(recent_trades, list) else 0} recent trades for {pair}")
-                        else:
-                            logger.warning(f"⚠️ Recent trades API returned HTTP {response.status_code} for {pair}")
-                            recent_trades = None
+                    except aiohttp.ClientResponseError as e:
+                        logger.warning(f"⚠️ Recent trades API returned HTTP {e.status} for {pair}")
+                        recent_trades = None
                     except Exception as api_error:
                         logger.warning(f"⚠️ Failed to fetch recent trades via HTTP API for {pair}: {api_error}")
-                        # Fallback: try SDK method
-                        try:
-                            recent_trades = info.recent_trades({'coin': pair})
-                            logger.debug(f"✅ Fetched trades via SDK for {pair}")
-                        except Exception as sdk_error:
-                            logger.warning(f"⚠️ SDK method also failed for {pair}: {sdk_error}")
-                            recent_trades = None
+                        recent_trades = None
                     
                     if recent_trades and isinstance(recent_trades, list) and len(recent_trades) > 0:
                         # Calculate net flow from trades and volume metrics
                         # 'B' = bid (buy), 'A' = ask (sell)
-                        trade_count = 0
-                        recent_volume_total = 0
-                        all_volumes = []  # Track volumes for average calculation
-                        
-                        # Process last 500 trades for volume average (or all available if less)
-                        max_trades_for_avg = min(500, len(recent_trades))
-                        for trade in recent_trades[:max_trades_for_avg]:
-                            try:
-                                # Handle both dict and object formats
-                                if isinstance(trade, dict):
-                                    price = float(trade.get('px', 0))
-                                    size = float(trade.get('sz', 0))
-                                    side = trade.get('side', 'B')
-                                else:
-                                    price = float(getattr(trade, 'px', 0))
-                                    size = float(getattr(trade, 'sz', 0))
-                                    side = getattr(trade, 'side', 'B')
-                                
-                                if price > 0 and size > 0:
-                                    volume = price * size
-                                    all_volumes.append(volume)
-                                    
-                                    # Only count first 100 for flow calculation
-                                    if trade_count < 100:
-                                        trade_count += 1
-                                        recent_volume_total += volume
-                                        
-                                        if side == 'B':  # Bid = buy
-                                            buy_volume += volume
-                                        elif side == 'A':  # Ask = sell
-                                            sell_volume += volume
-                            except Exception as trade_error:
-                                logger.debug(f"Error processing trade for {pair}: {trade_error}")
-                                continue
+                        buy_volume, sell_volume, recent_volume_total, avg_volume, trade_count = trade_flow(recent_trades)
                         
                         total_volume = buy_volume + sell_volume
                         if total_volume > 0:
                             net_flow = buy_volume - sell_volume  # Positive = buying pressure
                             flow_ratio = buy_volume / total_volume  # >0.5 = bullish
                             
-                            # Calculate volume average for confirmation
-                            avg_volume = sum(all_volumes) / len(all_volumes) if all_volumes else 0
+                            # Volume average (last 500 trades) for confirmation
                             volume_ratio = recent_volume_total / avg_volume if avg_volume > 0 else 1.0
                             
                             liquidity_flow = {
@@ -1381,11 +2302,14 @@ class BotInstance:
                                 'avg_volume': avg_volume,
                                 'volume_ratio': volume_ratio  # Recent vs average
                             }
-                            logger.debug(f"✅ Calculated flow for {pair}: net_flow=${net_flow/1_000:.2f}K, buy=${buy_volume/1_000:.2f}K, sell=${sell_volume/1_000:.2f}K, ratio={flow_ratio*100:.1f}%, volume_ratio={volume_ratio:.2f}x")
+                            if DEBUG_ENABLED:
+                                logger.debug(f"✅ Calculated flow for {pair}: net_flow=${net_flow/1_000:.2f}K, buy=${buy_volume/1_000:.2f}K, sell=${sell_volume/1_000:.2f}K, ratio={flow_ratio*100:.1f}%, volume_ratio={volume_ratio:.2f}x")
                         else:
-                            logger.debug(f"⚠️ No valid trades found for {pair} (processed {trade_count} trades)")
+                            if DEBUG_ENABLED:
+                                logger.debug(f"⚠️ No valid trades found for {pair} (processed {trade_count} trades)")
                     else:
-                        logger.debug(f"⚠️ No recent trades data for {pair} (response type: {type(recent_trades)})")
+                        if DEBUG_ENABLED:
+                            logger.debug(f"⚠️ No recent trades data for {pair} (response type: {type(recent_trades)})")
                 except Exception as e:
                     logger.warning(f"❌ Failed to calculate net flow from trades for {pair}: {e}", exc_info=True)
                 
@@ -1395,9 +2319,11 @@ class BotInstance:
                     # Skip entry logic if we already have a position
                     pass
                 elif not support_level:
-                    logger.debug(f"📊 {pair} No support level data from scanner - cannot trade")
+                    if DEBUG_ENABLED:
+                        logger.debug(f"📊 {pair} No support level data from scanner - cannot trade")
                 elif not liquidity_flow:
-                    logger.debug(f"📊 {pair} Has support level but no liquidity flow data available - cannot trade")
+                    if DEBUG_ENABLED:
+                        logger.debug(f"📊 {pair} Has support level but no liquidity flow data available - cannot trade")
                 elif support_level and liquidity_flow:
                     support_price = support_level['price']
                     support_timeframe = support_level.get('timeframe', 'unknown')
@@ -1427,21 +2353,29 @@ class BotInstance:
                     
                     # Log why trade isn't happening
                     if support_distance_pct > support_touch_threshold:
-                        logger.debug(f"📊 {pair} Support at ${support_price:.2f} but price too far: {support_distance_pct:.2f}% away (threshold: {support_touch_threshold}%)")
+                        if DEBUG_ENABLED:
+                            logger.debug(f"📊 {pair} Support at ${support_price:.2f} but price too far: {support_distance_pct:.2f}% away (threshold: {support_touch_threshold}%)")
                     elif not liquidity_flow['is_bullish']:
-                        logger.debug(f"📊 {pair} At support ${support_price:.2f} but flow is bearish (net_flow=${net_flow/1_000:.2f}K, ratio={flow_ratio*100:.1f}%)")
+                        if DEBUG_ENABLED:
+                            logger.debug(f"📊 {pair} At support ${support_price:.2f} but flow is bearish (net_flow=${net_flow/1_000:.2f}K, ratio={flow_ratio*100:.1f}%)")
                     elif net_flow < min_net_flow:
-                        logger.debug(f"📊 {pair} At support ${support_price:.2f} but net flow too low: ${net_flow/1_000:.2f}K (required: ${min_net_flow/1_000:.2f}K)")
+                        if DEBUG_ENABLED:
+                            logger.debug(f"📊 {pair} At support ${support_price:.2f} but net flow too low: ${net_flow/1_000:.2f}K (required: ${min_net_flow/1_000:.2f}K)")
                     elif flow_ratio < min_buy_ratio:
-                        logger.debug(f"📊 {pair} At support ${support_price:.2f} but buy ratio too low: {flow_ratio*100:.1f}% (required: {min_buy_ratio*100:.0f}%)")
+                        if DEBUG_ENABLED:
+                            logger.debug(f"📊 {pair} At support ${support_price:.2f} but buy ratio too low: {flow_ratio*100:.1f}% (required: {min_buy_ratio*100:.0f}%)")
                     elif support_touches < min_support_touches:
-                        logger.debug(f"📊 {pair} At support ${support_price:.2f} but support too weak: {support_touches} touches (required: {min_support_touches})")
+                        if DEBUG_ENABLED:
+                            logger.debug(f"📊 {pair} At support ${support_price:.2f} but support too weak: {support_touches} touches (required: {min_support_touches})")
                     elif total_volume < min_total_volume:
-                        logger.debug(f"📊 {pair} At support ${support_price:.2f} but total volume too low: ${total_volume/1_000:.2f}K (required: ${min_total_volume/1_000:.2f}K)")
+                        if DEBUG_ENABLED:
+                            logger.debug(f"📊 {pair} At support ${support_price:.2f} but total volume too low: ${total_volume/1_000:.2f}K (required: ${min_total_volume/1_000:.2f}K)")
                     elif volume_ratio < min_volume_ratio:
-                        logger.debug(f"📊 {pair} At support ${support_price:.2f} but volume ratio too low: {volume_ratio:.2f}x (required: {min_volume_ratio}x) - DEAD ZONE DETECTED")
+                        if DEBUG_ENABLED:
+                            logger.debug(f"📊 {pair} At support ${support_price:.2f} but volume ratio too low: {volume_ratio:.2f}x (required: {min_volume_ratio}x) - DEAD ZONE DETECTED")
                     elif timeframe_weight < min_timeframe_weight:
-                        logger.debug(f"📊 {pair} At support ${support_price:.2f} but timeframe too low: {support_timeframe} (weight: {timeframe_weight}, prefer 30m+)")
+                        if DEBUG_ENABLED:
+                            logger.debug(f"📊 {pair} At support ${support_price:.2f} but timeframe too low: {support_timeframe} (weight: {timeframe_weight}, prefer 30m+)")
                     else:
                         # Price is near support AND all quality filters pass - check final conditions
                         is_price_above_support = current_price >= support_price * 0.99925  # Within 0.075% above support
@@ -1502,7 +2436,7 @@ class BotInstance:
                             except Exception as open_error:
                                 logger.error(f"❌ Exception calling open_position for {pair}: {open_error}", exc_info=True)
                                 await self.log('error', f"❌ Exception opening position for {pair}: {str(open_error)}", {'error': str(open_error)})
-                        else:
+                        elif DEBUG_ENABLED:
                             failed_checks = []
                             if not is_price_above_support:
                                 failed_checks.append("price_not_above_support")
@@ -1517,7 +2451,7 @@ class BotInstance:
                 await self.log('error', f"❌ Error analyzing support liquidity for {pair}: {str(e)}", {'error': str(e), 'error_type': type(e).__name__})
             
                 # 3. LOG MARKET DATA (every 5 seconds)
-                last_pair_update = self.last_market_metrics_update_time.get(pair, 0)
+                last_pair_update = self.last_market_metrics_update_time.get(pair, float('-inf'))
                 if current_time - last_pair_update >= 5:
                     # Build log message with all data
                     log_parts = [f"📊 {pair} @ ${current_price:.2f}"]
@@ -1577,9 +2511,8 @@ class BotInstance:
             dynamic_tp: Optional dynamic take profit price (overrides percentage-based TP)
         """
         try:
-            position_size_usd = self.strategy['position_size']  # Position size in USD
-            stop_loss_pct = self.strategy['stop_loss_percent']
-            take_profit_pct = self.strategy['take_profit_percent']
+            position_size_usd = self.position_size_usd  # Position size in USD
+            take_profit_pct = self.take_profit_pct
             
             # CRITICAL: Convert USD position size to units (size = USD / price)
             # position_size is in dollars, but 'size' field should be in units
@@ -1589,24 +2522,24 @@ class BotInstance:
             
             # Calculate SL/TP
             if side == 'long':
-                stop_loss = price * (1 - stop_loss_pct / 100)
+                stop_loss = price * self.sl_mult_long
                 # Use dynamic TP if provided, otherwise use percentage-based TP
                 if dynamic_tp is not None:
                     take_profit = dynamic_tp
-                    logger.info(f"🎯 Using dynamic TP: ${take_profit:.2f} (instead of ${price * (1 + take_profit_pct / 100):.2f} from {take_profit_pct}%)")
+                    logger.info(f"🎯 Using dynamic TP: ${take_profit:.2f} (instead of ${price * self.tp_mult_long:.2f} from {take_profit_pct}%)")
                 else:
-                    take_profit = price * (1 + take_profit_pct / 100)
+                    take_profit = price * self.tp_mult_long
             else:
-                stop_loss = price * (1 + stop_loss_pct / 100)
+                stop_loss = price * self.sl_mult_short
                 # Use dynamic TP if provided, otherwise use percentage-based TP
                 if dynamic_tp is not None:
                     take_profit = dynamic_tp
-                    logger.info(f"🎯 Using dynamic TP: ${take_profit:.2f} (instead of ${price * (1 - take_profit_pct / 100):.2f} from {take_profit_pct}%)")
+                    logger.info(f"🎯 Using dynamic TP: ${take_profit:.2f} (instead of ${price * self.tp_mult_short:.2f} from {take_profit_pct}%)")
                 else:
-                    take_profit = price * (1 - take_profit_pct / 100)
+                    take_profit = price * self.tp_mult_short
             
             # Insert position
-            position_id = str(uuid.uuid4())  # Generate ID for position
+            position_id = new_id()  # Generate ID for position
             position_data = {
                 'id': position_id,
                 'bot_id': self.bot_id,
@@ -1617,84 +2550,12 @@ class BotInstance:
                 'current_price': price,
                 'stop_loss': stop_loss,
                 'take_profit': take_profit,
-                'opened_at': datetime.now().isoformat(),
+                'opened_at': self.now_iso,
                 'status': 'open'
             }
             
-            logger.info(f"📝 Inserting position for {pair} {side} @ ${price:.2f}")
-            try:
-                result = supabase.table('bot_positions').insert(position_data).execute()
-                
-                # Log result structure for debugging
-                logger.debug(f"Insert result: type={type(result)}, dir={[x for x in dir(result) if not x.startswith('_')]}")
-                if hasattr(result, 'data'):
-                    logger.debug(f"Result.data: {result.data}")
-                if hasattr(result, 'error'):
-                    logger.debug(f"Result.error: {result.error}")
-                
-            except Exception as e:
-                # Supabase Python client raises exceptions for errors
-                error_str = str(e)
-                error_type = type(e).__name__
-                logger.error(f"❌ Exception inserting position: {error_type}: {error_str}", exc_info=True)
-                
-                # Try to extract error message from exception - be careful with attribute access
-                error_msg = error_str  # Default to string representation
-                try:
-                    if hasattr(e, 'message') and e.message:
-                        error_msg = str(e.message)
-                    elif hasattr(e, 'args') and len(e.args) > 0:
-                        error_msg = str(e.args[0])
-                    elif hasattr(e, '__dict__'):
-                        # Check if error has a message in its dict
-                        if 'message' in e.__dict__:
-                            error_msg = str(e.__dict__['message'])
-                except Exception as extract_error:
-                    logger.error(f"❌ Error extracting error message: {extract_error}")
-                    error_msg = error_str
-                
-                try:
-                    await self.log('error', f"❌ Exception inserting position for {pair}: {error_msg}", {
-                        'error': error_msg,
-                        'error_type': error_type,
-                        'full_error': error_str
-                    })
-                except Exception as log_error:
-                    logger.error(f"❌ Failed to log error: {log_error}")
-                
-                return False
-            
-            # Check for Supabase errors in result object
-            if hasattr(result, 'error') and result.error:
-                # Handle different error formats
-                if isinstance(result.error, dict):
-                    error_msg = result.error.get('message', str(result.error))
-                elif isinstance(result.error, str):
-                    error_msg = result.error
-                else:
-                    error_msg = str(result.error)
-                logger.error(f"❌ Supabase error inserting position: {error_msg} | Full result: {result}")
-                await self.log('error', f"❌ Failed to insert position for {pair}: {error_msg}", {'error': error_msg, 'full_result': str(result)})
-                return False
-            
-            # Check if result is actually an error dict
-            if isinstance(result, dict) and 'message' in result:
-                error_msg = result.get('message', 'Unknown error')
-                logger.error(f"❌ Supabase returned error dict: {error_msg} | Full result: {result}")
-                await self.log('error', f"❌ Failed to insert position for {pair}: {error_msg}", {'error': error_msg, 'full_result': str(result)})
-                return False
-            
-            if not hasattr(result, 'data') or not result.data or len(result.data) == 0:
-                error_msg = f"No data returned from insert. Result type: {type(result)}, Result: {result}"
-                logger.error(f"❌ Position insert returned no data for {pair}: {error_msg}")
-                await self.log('error', f"❌ Failed to insert position for {pair} - No data returned", {'result': str(result), 'result_type': str(type(result))})
-                return False
-            
-            # Verify the insert succeeded (we already have position_id from generation)
-            logger.info(f"✅ Position inserted: {position_id}")
-            
-            # Insert trade
-            trade_id = str(uuid.uuid4())  # Generate ID for trade
+            # Entry trade (inserted together with the position)
+            trade_id = new_id()  # Generate ID for trade
             trade_data = {
                 'id': trade_id,
                 'bot_id': self.bot_id,
@@ -1703,35 +2564,38 @@ class BotInstance:
                 'side': 'buy' if side == 'long' else 'sell',
                 'size': position_size_units,  # Use units, not USD
                 'price': price,
-                'executed_at': datetime.now().isoformat(),
+                'executed_at': self.now_iso,
                 'mode': self.mode
             }
             
-            logger.info(f"📝 Inserting trade for {pair} {side} @ ${price:.2f}")
+            logger.info(f"📝 Inserting position + trade for {pair} {side} @ ${price:.2f}")
             try:
-                trade_result = supabase.table('bot_trades').insert(trade_data).execute()
+                # One round trip, one transaction: see open_position_atomic in bot-engine-functions.sql
+                result = await db_rpc('open_position_atomic', {
+                    'p_position': position_data,
+                    'p_trade': trade_data,
+                    'p_monitoring_log_id': self.monitoring_log_ids.get(pair)  # Deleted in the same transaction
+                })
             except Exception as e:
-                logger.error(f"❌ Exception inserting trade: {e}", exc_info=True)
-                await self.log('error', f"❌ Exception inserting trade for {pair}: {str(e)}", {'error': str(e)})
-                return False
-            
-            # Check for Supabase errors
-            if hasattr(trade_result, 'error') and trade_result.error:
-                error_msg = str(trade_result.error) if trade_result.error else "Unknown error"
-                logger.error(f"❌ Supabase error inserting trade: {error_msg}")
-                await self.log('error', f"❌ Failed to insert trade for {pair}: {error_msg}", {'error': error_msg})
+                # Supabase Python client raises exceptions for errors
+                error_str = str(e)
+                error_type = type(e).__name__
+                error_msg = str(getattr(e, 'message', None) or (e.args[0] if e.args else error_str))
+                await self.report_error(f"❌ Exception opening position for {pair}: {error_msg}", {
+                    'error': error_msg,
+                    'error_type': error_type,
+                    'full_error': error_str
+                }, e)
                 return False
             
-            if not hasattr(trade_result, 'data') or not trade_result.data or len(trade_result.data) == 0:
-                error_msg = f"No data returned from trade insert. Result type: {type(trade_result)}, Result: {trade_result}"
-                logger.error(f"❌ Trade insert returned no data for {pair}: {error_msg}")
-                await self.log('error', f"❌ Failed to insert trade for {pair} - No data returned", {'result': str(trade_result)})
+            if not result:
+                await self.report_error(f"❌ Failed to open position for {pair} - No data returned", {'result': str(result)})
                 return False
             
-            logger.info(f"✅ Trade inserted successfully")
+            logger.info(f"✅ Position + trade inserted: {position_id} / {trade_id}")
             
             # CRITICAL: Update self.positions immediately so next tick doesn't open duplicate
-            self.positions.append({
+            position = {
                 'id': position_id,
                 'symbol': pair,
                 'side': side,
@@ -1741,7 +2605,10 @@ class BotInstance:
                 'stop_loss': stop_loss,
                 'take_profit': take_profit,
                 'status': 'open'
-            })
+            }
+            self.positions.append(position)
+            self.positions_by_symbol[pair] = position
+            self.position_columns = None
             logger.info(f"✅ Updated positions list: {len(self.positions)} positions")
             
             # Initialize position metadata for risk management
@@ -1753,13 +2620,10 @@ class BotInstance:
             }
             logger.debug(f"📊 Initialized metadata for position {position_id}")
             
-            # Delete monitoring log since we now have a position
-            if pair in self.monitoring_log_ids:
-                try:
-                    supabase.table('bot_logs').delete().eq('id', self.monitoring_log_ids[pair]).execute()
-                    del self.monitoring_log_ids[pair]
-                except Exception as e:
-                    logger.warning(f"Failed to delete monitoring log for {pair}: {e}")
+            # The monitoring log was deleted by open_position_atomic - forget it (and don't recreate it at the end of the tick)
+            monitoring_log_id = self.monitoring_log_ids.pop(pair, None)
+            if monitoring_log_id is not None:
+                self.pending_log_updates.pop(monitoring_log_id, None)
             
             await self.log(
                 'trade',
@@ -1770,79 +2634,89 @@ class BotInstance:
             return True
             
         except Exception as e:
-            logger.error(f"❌ CRITICAL ERROR opening position for {pair}: {e}", exc_info=True)
-            await self.log('error', f"❌ Failed to open position for {pair}: {str(e)}", {'error': str(e)})
+            await self.report_error(f"❌ Failed to open position for {pair}: {str(e)}", {'error': str(e)}, e)
             return False
     
+    async def report_error(self, message: str, data: dict, exc: Optional[BaseException] = None):
+        """Report an error to the console and bot_logs, rate limited per bot
+        
+        Within error_limiter's budget (burst of 5, then 1/s) the error is logged with its
+        traceback and written to bot_logs. Past it - e.g. every tick failing during an outage -
+        it is only a single console line, so the failure doesn't also flood the database.
+        """
+        if self.error_limiter.try_acquire():
+            logger.opt(exception=exc).error(f"[{self.name}] {message}")
+            await self.log('error', message, data)
+            return
+        self.suppressed_errors += 1
+        logger.error(f"[{self.name}] {message} (rate limited - {self.suppressed_errors} error report(s) suppressed)")
+    
+    def sync_positions(self, positions: List[dict]):
+        """Replace the in-memory open positions with a fresh copy from the database"""
+        self.positions = positions
+        self.positions_by_symbol = {p['symbol']: p for p in positions}
+        self.position_columns = None
+        self.positions_synced_at = self.now_mono
+        # Initialize metadata for any new positions that don't have it
+        for pos in positions:
+            pos_id = pos['id']
+            if pos_id not in self.position_metadata:
+                # New position from database - initialize metadata
+                self.position_metadata[pos_id] = {
+                    'highest_profit_pct': 0.0,
+                    'highest_profit_price': pos.get('entry_price', 0),
+                    'first_profit_time': None,
+                    'original_stop_loss': pos.get('stop_loss', 0)
+                }
+                logger.debug(f"📊 Initialized metadata for existing position {pos_id}")
+    
+    @staticmethod
+    def describe_exit_levels(pair: str, side: str, price: float, take_profit: Optional[float], stop_loss: Optional[float]) -> str:
+        """Debug line with the distance to TP/SL (only built when debug logging is enabled)"""
+        sign = SIDE_SIGN.get(side, -1.0)
+        tp_str = f"${take_profit:.2f} ({sign * (take_profit - price) / price * 100:+.2f}% away)" if take_profit else "N/A"
+        sl_str = f"${stop_loss:.2f} ({sign * (price - stop_loss) / price * 100:+.2f}% away)" if stop_loss else "N/A"
+        return f"🔍 {pair} {side.upper()} | Price: ${price:.2f} | TP: {tp_str} | SL: {sl_str}"
+    
     async def check_positions(self):
         """Check and manage open positions"""
-        # Refresh positions from database to get latest data (including updated unrealized_pnl)
-        try:
-            result = supabase.table('bot_positions')\
-                .select('*')\
-                .eq('bot_id', self.bot_id)\
-                .eq('status', 'open')\
-                .execute()
-            
-            if result.data:
-                # Preserve metadata for existing positions
-                old_positions = {p['id']: p for p in self.positions}
-                # Update self.positions with fresh data from database
-                self.positions = result.data
-                # Initialize metadata for any new positions that don't have it
-                for pos in self.positions:
-                    pos_id = pos['id']
-                    if pos_id not in self.position_metadata:
-                        # New position from database - initialize metadata
-                        self.position_metadata[pos_id] = {
-                            'highest_profit_pct': 0.0,
-                            'highest_profit_price': pos.get('entry_price', 0),
-                            'first_profit_time': None,
-                            'original_stop_loss': pos.get('stop_loss', 0)
-                        }
-                        logger.debug(f"📊 Initialized metadata for existing position {pos_id}")
-        except Exception as e:
-            logger.warning(f"Failed to refresh positions from database: {e}")
-            # Continue with existing self.positions if refresh fails
+        # Mark every position in one kernel pass over its column arrays (only prices change per tick;
+        # the columns are rebuilt only after positions open, close, sync or move their stop)
+        positions = self.positions
+        if not positions:
+            return
+        if self.position_columns is None:
+            self.position_columns = position_columns(positions)
+        signs, entry_prices, sizes, stop_losses, take_profits = self.position_columns
+        current_prices = np.fromiter((self.last_prices.get(p['symbol'], np.nan) for p in positions), dtype=np.float64, count=len(positions))
+        marks = zip(positions, current_prices.tolist(), *(column.tolist() for column in position_kernel(
+            signs, entry_prices, sizes, current_prices, stop_losses, take_profits)))
         
-        for position in self.positions:
+        # Per-position side effects (logs, metadata, break-even, exits) stay in Python
+        for position, current_price, pnl, pnl_pct, exit_code, move_to_entry in marks:
+            if current_price != current_price:
+                continue  # No price for this symbol yet (NaN)
             pair = position['symbol']
-            
-            if pair not in self.last_prices:
-                continue
-            
-            current_price = self.last_prices[pair]
             entry_price = position['entry_price']
             side = position['side']
             
-            # Calculate P&L
-            if side == 'long':
-                pnl = (current_price - entry_price) * position['size']
-            else:
-                pnl = (entry_price - current_price) * position['size']
-            
-            pnl_pct = (pnl / (entry_price * position['size'])) * 100
-            
-            # Update position in database
-            supabase.table('bot_positions')\
-                .update({'current_price': current_price, 'unrealized_pnl': pnl})\
-                .eq('id', position['id'])\
-                .execute()
+            # Queue the mark-to-market update - the engine writes every bot's in one RPC per tick.
+            # Skipped while the price hasn't moved since the last mark (P&L is a function of it)
+            if current_price != position.get('current_price'):
+                self.pending_position_updates[position['id']] = {
+                    'id': position['id'],
+                    'current_price': current_price,
+                    'unrealized_pnl': pnl
+                }
+                position['current_price'] = current_price
             
             # Update position status log in place (every 5 seconds)
-            current_time = datetime.now().timestamp()
-            last_update = self.last_position_update_time.get(pair, 0)
+            current_time = self.now_mono
+            last_update = self.last_position_update_time.get(pair, float('-inf'))
             
             if current_time - last_update >= 5:  # Update every 5 seconds
-                emoji = '💚' if pnl >= 0 else '❤️'
                 stop_loss = position.get('stop_loss')
                 take_profit = position.get('take_profit')
-                
-                # Format TP/SL info
-                tp_str = f"TP: ${take_profit:.2f}" if take_profit else "TP: N/A"
-                sl_str = f"SL: ${stop_loss:.2f}" if stop_loss else "SL: N/A"
-                
-                message = f"📊 {emoji} {side.upper()} {pair} | Entry: ${entry_price:.2f} → ${current_price:.2f} | {tp_str} | {sl_str} | P&L: ${pnl:.2f} ({pnl_pct:+.2f}%)"
                 data = {
                     'position_id': position['id'],
                     'pnl': pnl,
@@ -1853,6 +2727,11 @@ class BotInstance:
                     'take_profit': take_profit,
                     'update_type': 'position_status'
                 }
+                message = self.POSITION_TEMPLATE.format_map(dict(
+                    data, emoji='💚' if pnl >= 0 else '❤️', side=side.upper(), pair=pair,
+                    tp=f"${take_profit:.2f}" if take_profit else "N/A",
+                    sl=f"${stop_loss:.2f}" if stop_loss else "N/A"
+                ))
                 
                 await self.log_update('position_status', pair, message, data)
                 self.last_position_update_time[pair] = current_time
@@ -1873,12 +2752,12 @@ class BotInstance:
             if pnl_pct > metadata['highest_profit_pct']:
                 metadata['highest_profit_pct'] = pnl_pct
                 metadata['highest_profit_price'] = current_price
-                logger.debug(f"📈 {pair} new peak profit: {pnl_pct:+.2f}% @ ${current_price:.2f}")
+                logger.debug("📈 {} new peak profit: {:+.2f}% @ ${:.2f}", pair, pnl_pct, current_price)
             
             # Track when position first enters profit
             if pnl_pct > 0 and metadata['first_profit_time'] is None:
                 metadata['first_profit_time'] = current_time
-                logger.debug(f"💰 {pair} entered profit for first time")
+                logger.debug("💰 {} entered profit for first time", pair)
             
             # Calculate time in profit (in minutes)
             time_in_profit = 0
@@ -1891,59 +2770,23 @@ class BotInstance:
             
             # Apply risk management: Break-even protection only
             # Move SL to entry_price when profit >= 0.15% to protect against losses
-            if side == 'long' and pnl_pct >= 0.15 and stop_loss and stop_loss < entry_price:
-                new_sl = entry_price
-                if abs(new_sl - stop_loss) > 0.0001:  # Only update if significantly different
-                    try:
-                        supabase.table('bot_positions')\
-                            .update({'stop_loss': new_sl})\
-                            .eq('id', position_id)\
-                            .execute()
-                        position['stop_loss'] = new_sl  # Update local copy
-                        stop_loss = new_sl
-                        logger.info(f"🛡️ {pair} Break-even protection: Moved SL to entry ${entry_price:.2f}")
-                    except Exception as e:
-                        logger.error(f"❌ Failed to update break-even SL for {pair}: {e}")
-            elif side == 'short' and pnl_pct >= 0.15 and stop_loss and stop_loss > entry_price:
-                new_sl = entry_price
-                if abs(new_sl - stop_loss) > 0.0001:
-                    try:
-                        supabase.table('bot_positions')\
-                            .update({'stop_loss': new_sl})\
-                            .eq('id', position_id)\
-                            .execute()
-                        position['stop_loss'] = new_sl
-                        stop_loss = new_sl
-                        logger.info(f"🛡️ {pair} Break-even protection: Moved SL to entry ${entry_price:.2f}")
-                    except Exception as e:
-                        logger.error(f"❌ Failed to update break-even SL for {pair}: {e}")
-            
-            # Standard TP/SL Checks (original logic - let winners run to TP)
-            should_close = False
-            reason = ''
+            if move_to_entry:
+                try:
+                    await db_execute(supabase.table('bot_positions')\
+                        .update({'stop_loss': entry_price})\
+                        .eq('id', position_id))
+                    position['stop_loss'] = entry_price  # Update local copy
+                    self.position_columns = None
+                    stop_loss = entry_price
+                    logger.info(f"🛡️ {pair} Break-even protection: Moved SL to entry ${entry_price:.2f}")
+                except Exception as e:
+                    logger.error(f"❌ Failed to update break-even SL for {pair}: {e}")
             
-            if side == 'long':
-                distance_to_tp = ((take_profit - current_price) / current_price * 100) if take_profit else None
-                distance_to_sl = ((current_price - stop_loss) / current_price * 100) if stop_loss else None
-                logger.debug(f"🔍 {pair} LONG | Price: ${current_price:.2f} | TP: ${take_profit:.2f} ({distance_to_tp:+.2f}% away) | SL: ${stop_loss:.2f} ({distance_to_sl:+.2f}% away)")
-                
-                if stop_loss and current_price <= stop_loss:
-                    should_close = True
-                    reason = 'Stop Loss'
-                elif take_profit and current_price >= take_profit:
-                    should_close = True
-                    reason = 'Take Profit'
-            else:  # short
-                distance_to_tp = ((current_price - take_profit) / current_price * 100) if take_profit else None
-                distance_to_sl = ((stop_loss - current_price) / current_price * 100) if stop_loss else None
-                logger.debug(f"🔍 {pair} SHORT | Price: ${current_price:.2f} | TP: ${take_profit:.2f} ({distance_to_tp:+.2f}% away) | SL: ${stop_loss:.2f} ({distance_to_sl:+.2f}% away)")
-                
-                if stop_loss and current_price >= stop_loss:
-                    should_close = True
-                    reason = 'Stop Loss'
-                elif take_profit and current_price <= take_profit:
-                    should_close = True
-                    reason = 'Take Profit'
+            # Standard TP/SL Checks (original logic - let winners run to TP), decided by position_kernel
+            if DEBUG_ENABLED:
+                logger.debug(self.describe_exit_levels(pair, side, current_price, take_profit, stop_loss))
+            should_close = exit_code != 0
+            reason = 'Stop Loss' if exit_code == 1 else 'Take Profit'
             
             # Close position if any exit condition is met
             if should_close:
@@ -1956,31 +2799,30 @@ class BotInstance:
         """Close a position"""
         try:
             side = position['side']
-            pnl = (close_price - position['entry_price']) * position['size'] if side == 'long' else (position['entry_price'] - close_price) * position['size']
+            pnl = SIDE_SIGN.get(side, -1.0) * (close_price - position['entry_price']) * position['size']
             pnl_pct = (pnl / (position['entry_price'] * position['size'])) * 100
             
             logger.info(f"📝 Closing position {position['id']} for {position['symbol']} @ ${close_price:.2f} ({reason})")
             
             # Update position in database
             try:
-                supabase.table('bot_positions')\
+                await db_execute(supabase.table('bot_positions')\
                     .update({
                         'status': 'closed', 
                         'current_price': close_price, 
-                        'closed_at': datetime.now().isoformat(),
+                        'closed_at': self.now_iso,
                         'unrealized_pnl': pnl
                     })\
-                    .eq('id', position['id'])\
-                    .execute()
+                    .eq('id', position['id']))
                 logger.info(f"✅ Position updated in database")
             except Exception as e:
                 logger.error(f"❌ Failed to update position: {e}", exc_info=True)
                 return
             
             # Insert closing trade
-            trade_id = str(uuid.uuid4())
+            trade_id = new_id()
             try:
-                supabase.table('bot_trades').insert({
+                await db_execute(supabase.table('bot_trades').insert({
                     'id': trade_id,
                     'bot_id': self.bot_id,
                     'position_id': position['id'],
@@ -1989,9 +2831,9 @@ class BotInstance:
                     'size': position['size'],
                     'price': close_price,
                     'pnl': pnl,
-                    'executed_at': datetime.now().isoformat(),
+                    'executed_at': self.now_iso,
                     'mode': self.mode
-                }).execute()
+                }))
                 logger.info(f"✅ Closing trade inserted: {trade_id}")
             except Exception as e:
                 logger.error(f"❌ Failed to insert closing trade: {e}", exc_info=True)
@@ -1999,6 +2841,10 @@ class BotInstance:
             
             # CRITICAL: Remove from self.positions so we don't keep checking it
             self.positions = [p for p in self.positions if p['id'] != position['id']]
+            self.position_columns = None
+            self.pending_position_updates.pop(position['id'], None)  # Don't overwrite the closing price
+            if self.positions_by_symbol.get(position['symbol'], {}).get('id') == position['id']:
+                del self.positions_by_symbol[position['symbol']]
             logger.info(f"✅ Removed position from list. Remaining: {len(self.positions)}")
             
             # Clean up position metadata
@@ -2021,7 +2867,8 @@ class BotInstance:
             # Delete the position status log (it will be replaced with monitoring log)
             if pair in self.position_log_ids:
                 try:
-                    supabase.table('bot_logs').delete().eq('id', self.position_log_ids[pair]).execute()
+                    self.pending_log_updates.pop(self.position_log_ids[pair], None)  # Don't recreate it at the end of the tick
+                    await db_execute(supabase.table('bot_logs').delete().eq('id', self.position_log_ids[pair]))
                     del self.position_log_ids[pair]
                 except Exception as e:
                     logger.warning(f"Failed to delete position log for {pair}: {e}")
@@ -2031,7 +2878,7 @@ class BotInstance:
                 del self.last_position_update_time[pair]
             
             # Record close time for cooldown period
-            self.last_position_close_time[pair] = datetime.now().timestamp()
+            self.last_position_close_time[pair] = self.now_mono
             logger.info(f"⏸️ {pair} cooldown started - will wait {self.position_cooldown}s before next trade")
             
             await self.log(
@@ -2043,99 +2890,71 @@ class BotInstance:
             logger.error(f"❌ CRITICAL ERROR closing position: {e}", exc_info=True)
             await self.log('error', f"❌ Failed to close position: {str(e)}", {'error': str(e)})
     
-    async def log(self, log_type: str, message: str, data: dict):
-        """Log activity"""
+    async def log(self, log_type: str, message: str, data: dict, fmt: Optional[dict] = None):
+        """Log activity (buffered, flushed to Supabase in batches)
+        
+        If fmt is given, message is a str.format template filled from fmt at flush time
+        (off the event loop) instead of an f-string built eagerly on the tick path.
+        """
         try:
-            supabase.table('bot_logs').insert({
+            row = {
                 'bot_id': self.bot_id,
                 'user_id': self.user_id,
                 'log_type': log_type,
-                'message': message,
                 'data': data,
-                'created_at': datetime.now().isoformat()
-            }).execute()
+                'created_at': time.time()  # ISO-formatted at flush time by LogBuffer.render
+            }
+            if fmt is not None:
+                row['tpl'] = (message, fmt, f"[{self.name}] ")  # Rendered + echoed by LogBuffer.render
+                log_buffer.put(row)
+                return
+            
+            row['message'] = message
+            log_buffer.put(row)
             
             logger.info(f"[{self.name}] {message}")
         except Exception as e:
             logger.error(f"Failed to log: {e}")
     
     async def log_update(self, update_type: str, pair: str, message: str, data: dict):
-        """Update an existing log entry in place, or create new if doesn't exist"""
-        try:
-            # Determine which log ID dict to use
-            if update_type == 'position_status':
-                log_id_dict = self.position_log_ids
-            elif update_type == 'market_metrics':
-                log_id_dict = self.market_metrics_log_ids
-            else:
-                log_id_dict = self.monitoring_log_ids
-            
-            # Check if we have an existing log ID for this pair
-            if pair in log_id_dict:
-                log_id = log_id_dict[pair]
-                # Update existing log
-                try:
-                    # Update log_type for market_metrics to ensure it's correct
-                    update_data = {
-                        'message': message,
-                        'data': data,
-                        'created_at': datetime.now().isoformat()  # Update timestamp so it stays at top
-                    }
-                    if update_type == 'market_metrics':
-                        update_data['log_type'] = 'market_data'  # Ensure correct log type
-                    
-                    update_result = supabase.table('bot_logs')\
-                        .update(update_data)\
-                        .eq('id', log_id)\
-                        .execute()
-                    
-                    # Verify update succeeded
-                    if update_result.data and len(update_result.data) > 0:
-                        logger.debug(f"✅ Updated {update_type} log for {pair} (ID: {log_id})")
-                    else:
-                        logger.warning(f"⚠️ Update returned no data for {pair}, log may not exist. Creating new.")
-                        # Log doesn't exist, create new one
-                        raise Exception("Log entry not found")
-                except Exception as e:
-                    logger.warning(f"Failed to update log for {pair}, creating new: {e}")
-                    # If update fails, create new log
-                    log_type = 'market_data' if update_type == 'market_metrics' else 'info'
-                    result = supabase.table('bot_logs').insert({
-                        'bot_id': self.bot_id,
-                        'user_id': self.user_id,
-                        'log_type': log_type,
-                        'message': message,
-                        'data': data,
-                        'created_at': datetime.now().isoformat()
-                    }).execute()
-                    if result.data and len(result.data) > 0:
-                        log_id_dict[pair] = result.data[0]['id']
-            else:
-                # Create new log and store ID
-                log_type = 'market_data' if update_type == 'market_metrics' else 'info'
-                result = supabase.table('bot_logs').insert({
-                    'bot_id': self.bot_id,
-                    'user_id': self.user_id,
-                    'log_type': log_type,
-                    'message': message,
-                    'data': data,
-                    'created_at': datetime.now().isoformat()
-                }).execute()
-                if result.data and len(result.data) > 0:
-                    log_id_dict[pair] = result.data[0]['id']
-                    logger.debug(f"Created new {update_type} log for {pair}")
-                else:
-                    logger.warning(f"⚠️ Failed to create new {update_type} log for {pair} - no data returned")
-        except Exception as e:
-            logger.error(f"❌ Failed to log_update for {pair}: {e}", exc_info=True)
-            raise  # Re-raise so caller knows it failed
-
+        """Update the pair's log entry of this type in place (created on first use)
+        
+        The full row is queued under a client-generated id and upserted by BotEngine.tick
+        together with every other bot's updates, so a row that doesn't exist yet (or was
+        deleted) is simply created - no read-back or fallback insert per update.
+        """
+        # Determine which log ID dict to use
+        if update_type == 'position_status':
+            log_id_dict = self.position_log_ids
+        elif update_type == 'market_metrics':
+            log_id_dict = self.market_metrics_log_ids
+        else:
+            log_id_dict = self.monitoring_log_ids
+        
+        log_id = log_id_dict.get(pair)
+        if log_id is None:
+            log_id = log_id_dict[pair] = new_id()
+        self.pending_log_updates[log_id] = {
+            'id': log_id,
+            'bot_id': self.bot_id,
+            'user_id': self.user_id,
+            'log_type': 'market_data' if update_type == 'market_metrics' else 'info',
+            'message': message,
+            'data': data,
+            'created_at': time.time()  # Fresh per update so it stays at top (ISO-formatted by LogBuffer.render)
+        }
 
 async def main():
     """Main entry point"""
     engine = BotEngine()
-    await engine.start()
+    try:
+        await engine.start()
+    finally:
+        await close_connections()
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
 